@@ -0,0 +1,142 @@
+#!/usr/bin/python3
+# Throughput benchmark: sweeps algorithm x dimensions x population size x precision x objective size and records
+# wall time, evals/s, time per solveStep (generation) and peak memory, e.g.
+#   python3 benchmark.py --output baseline.json
+#   python3 benchmark.py --compare baseline.json --threshold 0.1
+# --compare exits with status 1 if any case lost more than threshold of its evals/s against the baseline.
+# days = 0 is the built-in 5 strategy omega (so at most 5 dimensions), days > 0 is an OmegaSeries over a synthetic
+# (days x dimensions) return matrix.
+import argparse
+import datetime
+import json
+import platform
+import random
+import sys
+import tracemalloc
+
+import numpy as np
+
+import headless
+from src.functions.series import OmegaSeries
+from src.runner import HeadlessRunner
+
+binary_algorithms = ['random', 'bf', 'bihc', 'ga', 'gabihc']
+population_algorithms = ['ga', 'gabihc', 'pso']
+
+
+def gen_returns(days, strategies, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(0.0005, 0.01, (days, strategies))
+
+
+def gen_cases(args):
+    for alg in args.algorithms:
+        for days in args.days:
+            for dims in args.dimensions:
+                if days == 0 and dims > 5:
+                    continue
+                for pop in args.pop_sizes if alg in population_algorithms else [None]:
+                    for prec in args.precisions if alg in binary_algorithms else [None]:
+                        yield {'algorithm': alg, 'days': days, 'dimensions': dims, 'popSize': pop,
+                               'precision': prec}
+
+
+def case_id(case):
+    return ','.join(k + '=' + str(v) for k, v in case.items())
+
+
+def build(case, objective):
+    argv = ['--algorithm', case['algorithm'], '--dimensions', str(case['dimensions']), '--do-forever', '1',
+            '--max-evals', '1']
+    if case['popSize'] is not None:
+        argv += ['--pop-size', str(case['popSize'])]
+    if case['precision'] is not None:
+        argv += ['--precision', str(case['precision'])]
+    return headless.build_algorithm(headless.parse_args(argv), objective)
+
+
+def run_case(case, max_evals, max_time, memory=True, seed=0):
+    objective = None
+    if case['days']:
+        objective = OmegaSeries(gen_returns(case['days'], case['dimensions'], seed))
+    random.seed(seed)
+    np.random.seed(seed)
+    runner = HeadlessRunner(build(case, objective), max_evals, max_time)
+    r = runner.run()
+    res = {
+        'evals': r['evals'],
+        'time': r['time'],
+        'evalsPerSecond': r['evalsPerSecond'],
+        'timePerStep': r['time'] / max(1, r['solveSteps']),
+        'be': r['be'],
+    }
+    if memory:
+        # separate run, tracemalloc slows everything down, so it must not affect the timings
+        random.seed(seed)
+        np.random.seed(seed)
+        runner = HeadlessRunner(build(case, objective), max_evals, max_time)
+        tracemalloc.start()
+        runner.run()
+        res['peakMemory'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return res
+
+
+def compare(results, baseline, threshold):
+    """prints the evals/s ratio of every case found in both, returns the ids of the regressions"""
+    regressions = []
+    for cid, r in results.items():
+        b = baseline.get(cid)
+        if b is None or not b['evalsPerSecond']:
+            continue
+        ratio = r['evalsPerSecond'] / b['evalsPerSecond']
+        bad = ratio < 1 - threshold
+        if bad:
+            regressions.append(cid)
+        print('%-80s %8.3fx%s' % (cid, ratio, '  REGRESSION' if bad else ''))
+    return regressions
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description='Optimiser throughput benchmark')
+    p.add_argument('--algorithms', nargs='+', default=['random', 'bf', 'bihc', 'ga', 'gabihc', 'pso'],
+                   choices=headless.algorithm_names)
+    p.add_argument('--dimensions', nargs='+', type=int, default=[2, 5, 20])
+    p.add_argument('--pop-sizes', nargs='+', type=int, default=[20, 100])
+    p.add_argument('--precisions', nargs='+', type=int, default=[2, 5])
+    p.add_argument('--days', nargs='+', type=int, default=[0, 1000], help='objective size, 0: built-in omega')
+    p.add_argument('--max-evals', type=int, default=20000, help='per case')
+    p.add_argument('--max-time', type=float, default=10, help='seconds, per case')
+    p.add_argument('--no-memory', action='store_true', help="skip the (second, traced) run for peak memory")
+    p.add_argument('--output', help='save the results, e.g. as a baseline')
+    p.add_argument('--compare', help='baseline file to compare against')
+    p.add_argument('--threshold', type=float, default=0.1, help='allowed evals/s loss against the baseline')
+    return p.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = {}
+    for case in gen_cases(args):
+        cid = case_id(case)
+        r = run_case(case, args.max_evals, args.max_time, not args.no_memory)
+        results[cid] = dict(case, **r)
+        print('%-80s %10.0f evals/s %9.3f ms/step %s' % (
+            cid, r['evalsPerSecond'], r['timePerStep'] * 1000,
+            '%8.1f KiB' % (r['peakMemory'] / 1024) if 'peakMemory' in r else ''))
+    if args.output:
+        meta = {'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.platform(),
+                'date': datetime.datetime.now().isoformat(), 'maxEvals': args.max_evals}
+        with open(args.output, 'w') as f:
+            json.dump({'meta': meta, 'results': results}, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(len(regressions), 'regression(s) over', args.threshold)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/python3
+# Runs a single algorithm without the OpenGL viewer, e.g. for batch jobs on servers without a display:
+#   python3 headless.py --algorithm pso --dimensions 5 --max-evals 200000 --output result.json
+#   python3 headless.py --algorithm ga --returns returns.csv --budget 1 --max-time 60
+#   python3 headless.py --algorithm bihc --restarts 32 --max-time 60
+#   python3 headless.py --algorithm bf --precision 1 --dimensions 3 --processes 8
+# every improvement of the best-so-far is printed as it happens, the final result is written as JSON
+# with --restarts, independent runs go to a process pool and only the merged best is reported
+# bf with --processes splits the grid into disjoint index ranges on a process pool; a bf run stopped by the budget
+# prints the index to resume it from with --start
+import argparse
+import json
+import time
+
+import numpy as np
+
+from src.algorithms.algorithm import Algorithm
+from src.algorithms.bf import AlgorithmBf
+from src.algorithms.bihc import AlgorithmBihc
+from src.algorithms.bounds import boundaries
+from src.algorithms.evaluator import evaluators
+from src.algorithms.ga import AlgorithmGa
+from src.algorithms.gabihc import AlgorithmGaBihc
+from src.algorithms.lp import AlgorithmLp
+from src.algorithms.pso import AlgorithmPso
+from src.algorithms.selection import selections
+from src.functions.functions import Functions
+from src.functions.series import OmegaSeries
+from src.multistart import MultiStart
+from src.runner import HeadlessRunner
+
+algorithm_names = ['random', 'bf', 'bihc', 'ga', 'gabihc', 'pso', 'lp']
+
+
+def load_returns(path):
+    """a (days x strategies) return matrix, from .npy or from a comma separated text file"""
+    if path.endswith('.npy'):
+        return np.load(path)
+    return np.loadtxt(path, delimiter=',', ndmin=2)
+
+
+def build_algorithm(args, objective=None):
+    """objective: an OmegaSeries to use instead of --returns"""
+    if objective is None and args.returns is not None:
+        objective = OmegaSeries(load_returns(args.returns), args.threshold)
+    if objective is None:
+        functions = [Functions.omega, Functions.omegaRange, Functions.omegaBatch, Functions.OmegaIncremental]
+        lfp = Functions.omegaLfp
+    else:
+        functions = objective.functions()
+        lfp = objective.omegaLfp
+        args.dimensions = objective.strategies
+    minimize = args.minimize
+    common = dict(func=functions, dimensions=args.dimensions, steps=1)
+    binary = dict(common, precision=args.precision, optimumIsMinimum=minimize, doForever=args.do_forever,
+                  cacheSize=args.cache_size, budget=args.budget, gray=args.gray)
+    convergence = {} if args.min_diversity is None else {'minDiversity': args.min_diversity}
+    incremental = {'auto': 'auto', 'on': True, 'off': False}[args.incremental]
+    population = dict(binary, popSize=args.pop_size, genNo=args.gen_no, genGrace=args.gen_grace,
+                      selMethod=args.selection, selPressure=args.sel_pressure, convergenceStop=args.convergence_stop,
+                      incremental=incremental, **convergence)
+    if args.algorithm == 'random':
+        return Algorithm(repeats=args.repeats, **binary)
+    if args.algorithm == 'bf':
+        return AlgorithmBf(chunkSize=args.chunk_size, start=args.start, **binary)
+    if args.algorithm == 'bihc':
+        return AlgorithmBihc(repeats=args.repeats, firstImprovement=args.first_improvement,
+                             randomOrder=args.random_order, incremental=incremental, **binary)
+    if args.algorithm == 'ga':
+        return AlgorithmGa(**population)
+    if args.algorithm == 'gabihc':
+        return AlgorithmGaBihc(**population)
+    if args.algorithm == 'pso':
+        convergence = {} if args.min_diversity is None else {'min_diversity': args.min_diversity}
+        return AlgorithmPso(minimize=minimize, pop_size=args.pop_size, gen_no=args.gen_no, gen_grace=args.gen_grace,
+                            do_forever=args.do_forever, budget=args.budget, convergence_stop=args.convergence_stop,
+                            boundary=args.boundary, **convergence, **common)
+    return AlgorithmLp(lfp=lfp, optimumIsMinimum=minimize, budget=args.budget, **common)
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description='Headless omega portfolio optimiser')
+    p.add_argument('--algorithm', choices=algorithm_names, default='pso')
+    p.add_argument('--returns', help='(days x strategies) return matrix, .npy or .csv; default: the built-in omega')
+    p.add_argument('--threshold', type=float, default=0.0, help='omega threshold L for --returns')
+    p.add_argument('--dimensions', type=int, default=5)
+    p.add_argument('--precision', type=int, default=5)
+    p.add_argument('--pop-size', type=int, default=100)
+    p.add_argument('--gen-no', type=int, default=1000)
+    p.add_argument('--gen-grace', type=int, default=200)
+    p.add_argument('--selection', choices=sorted(selections), default='roulette', help='GA selection operator')
+    p.add_argument('--sel-pressure', type=float, default=1,
+                   help='fitness exponent for roulette and rank, tournament size for tournament')
+    p.add_argument('--min-diversity', type=float,
+                   help='ga/gabihc/pso: population diversity under which the run counts as converged')
+    p.add_argument('--convergence-stop', action='store_true',
+                   help='ga/gabihc/pso: end (or with --do-forever restart) a run as soon as it has converged')
+    p.add_argument('--repeats', type=int, default=10000)
+    p.add_argument('--first-improvement', action='store_true', help='bihc: take the first better neighbour')
+    p.add_argument('--random-order', action='store_true', help='bihc: scan the neighbours in random order')
+    p.add_argument('--incremental', choices=['auto', 'on', 'off'], default='auto',
+                   help='bihc/ga/gabihc: evaluate single bit moves incrementally; auto: only for long return series, '
+                        'the two give slightly different evaluations and so different runs')
+    p.add_argument('--cache-size', type=int, default=0)
+    p.add_argument('--chunk-size', type=int, default=1 << 14, help='bf: grid points per batch')
+    p.add_argument('--start', type=int, default=0, help='bf: first grid index, to resume a run')
+    p.add_argument('--budget', type=float, help='only fully invested, long-only portfolios summing to this')
+    p.add_argument('--gray', action='store_true', help='random/bf/bihc/ga/gabihc: Gray-code the bitstrings')
+    p.add_argument('--boundary', choices=sorted(boundaries),
+                   help="pso: what to do with particles leaving the range, default clamp (simplex with --budget)")
+    p.add_argument('--check-vertices', action='store_true',
+                   help='lp with --budget: compare the result to an enumeration of the feasible vertices')
+    p.add_argument('--minimize', action='store_true')
+    p.add_argument('--do-forever', type=int, default=0, help='restart forever; needs --max-evals or --max-time')
+    p.add_argument('--max-evals', type=int)
+    p.add_argument('--max-time', type=float, help='seconds')
+    p.add_argument('--output', help='JSON result file')
+    p.add_argument('--quiet', action='store_true', help="don't print improvements")
+    p.add_argument('--profile', action='store_true', help='time every solveStep phase, see Algorithm.setProfiling')
+    p.add_argument('--restarts', type=int, default=1, help='independent runs on a process pool, best one wins')
+    p.add_argument('--processes', type=int, help='default: cpu count')
+    p.add_argument('--evaluator', choices=list(evaluators), default='serial',
+                   help='evaluate populations on a thread or process pool, for expensive --returns objectives')
+    p.add_argument('--workers', type=int, help='evaluator threads / processes, default: cpu count')
+    p.add_argument('--seed', type=int, default=0, help='base seed of the --restarts')
+    args = p.parse_args(argv)
+    if args.do_forever and args.max_evals is None and args.max_time is None:
+        p.error('--do-forever needs --max-evals or --max-time')
+    # the runs on a process pool are plain copies of the algorithm, without evaluator pools or profiling
+    pooled = None
+    if args.restarts > 1:
+        pooled = '--restarts'
+    elif args.algorithm == 'bf' and args.processes:
+        pooled = '--processes with bf'
+    if pooled is not None and (args.evaluator != 'serial' or args.workers is not None or args.profile):
+        p.error('--evaluator, --workers and --profile only apply to a single run, not to ' + pooled)
+    return args
+
+
+def main_multistart(args):
+    ms = MultiStart(build_algorithm(args), args.restarts, args.processes, args.max_evals, args.max_time, args.seed)
+    print(ms.algorithm, 'x', ms.restarts, 'restarts on', ms.processes, 'processes')
+    result = ms.run()
+    print('Best:', result['be'], 'found by restart', result['restart'], '#evals for best:', result['bstep'],
+          'Total evals:', result['evals'], 'evals/s: %.0f' % result['evalsPerSecond'])
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+    else:
+        print(json.dumps({k: v for k, v in result.items() if k != 'results'}))
+
+
+def main_bf_parallel(args):
+    alg = build_algorithm(args)
+    print(alg, 'on', args.processes, 'processes, grid indexes', alg.next, 'to', alg.end)
+    start = time.perf_counter()
+    alg.solveParallel(args.processes, args.max_evals, args.max_time)
+    wall_time = time.perf_counter() - start
+    finished = alg.next >= alg.end
+    result = {'algorithm': str(alg), 'be': alg.be, 'bv': alg.bv, 'bstep': alg.bstep, 'evals': alg.evals,
+              'time': wall_time, 'evalsPerSecond': alg.evals / wall_time if wall_time else 0, 'finished': finished}
+    print('Finished' if finished else 'Budget reached', 'Best:', alg.be, 'Total evals:', alg.evals,
+          'evals/s: %.0f' % result['evalsPerSecond'])
+    if not finished:
+        print('Resume with --start', alg.next)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+    else:
+        print(json.dumps(result))
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.restarts > 1:
+        return main_multistart(args)
+    if args.algorithm == 'bf' and args.processes:
+        return main_bf_parallel(args)
+    runner = HeadlessRunner(build_algorithm(args), args.max_evals, args.max_time)
+    runner.algorithm.setProfiling(args.profile)
+    if args.evaluator != 'serial':
+        runner.algorithm.setEvaluator(evaluators[args.evaluator](args.workers))
+    print(runner.algorithm)
+    try:
+        for imp in runner.improvements():
+            if not args.quiet:
+                print('Best:', imp['be'], '#evals for best:', imp['bstep'], 'restart:', imp['restart'],
+                      'time: %.3fs' % imp['time'])
+    finally:
+        runner.algorithm.setEvaluator(None)
+    result = runner.result()
+    print('Finished' if runner.finished else 'Budget reached', 'Best:', result['be'], 'Total evals:',
+          result['evals'], 'evals/s: %.0f' % result['evalsPerSecond'])
+    if args.algorithm == 'lp':
+        print('LP status:', ', '.join(runner.algorithm.status) or 'no pieces')
+    if args.check_vertices and args.algorithm == 'lp':
+        be, bv, ok = runner.algorithm.checkVertices()
+        print('Vertex check:', 'ok' if ok else 'MISMATCH', 'best vertex:', be, bv)
+    if args.algorithm == 'bf' and not runner.finished:
+        print('Resume with --start', runner.algorithm.next)
+    if args.profile:
+        print('Phases:', runner.algorithm.formatPhaseStats())
+    if args.output:
+        runner.save(args.output)
+    else:
+        print(json.dumps({k: v for k, v in result.items() if k != 'improvements'}))
+
+
+if __name__ == "__main__":
+    main()
@@ -11,8 +11,10 @@ from src.algorithms.bf import AlgorithmBf
 from src.algorithms.bihc import AlgorithmBihc
 from src.algorithms.ga import AlgorithmGa
 from src.algorithms.gabihc import AlgorithmGaBihc
+from src.algorithms.lp import AlgorithmLp
 from src.algorithms.pso import AlgorithmPso
 from src.functions.functions import Functions
+from src.functions.series import OmegaSeries
 from src.opengl.solver import OglSolver
 
 from src.types import DrawStyle
@@ -38,14 +40,15 @@ Keys:
   f: 2d view (3d bottom), see the points the algorithm has visited (white: current, black: previous)
   t: 2d view (3d top)
   space: pause
-  n: if paused, advance 1 step
+  n: if paused, advance 1 run (steps solveSteps) of the background worker
   p: toggle verbose message printing, such as after every algorithm step
+  i: toggle per-phase timing of the algorithm steps, printed with the verbose messages
   b: toggle plot projection drawing
   v: toggle plot projection visited points drawing
   PgUp: increase point visual size
   PgDown: decrease point visual size
   +, - (Numpad): modify the vertical position of the projection. The projection can be moved above the plot.
-  *, / (Numpad): double or halve the number a steps the algorithm does every frame
+  *, / (Numpad): double or halve the number of steps the algorithm does every run of the background worker
   c: cycle through contrast/colouring settings
   <, >: switch to the prev / next algorithm (loops)
   /: toggles the currently selected algorithm to run forever
@@ -91,7 +94,11 @@ def main():
     precision = 20
     steps = 2
     algos = []
-    functions = [Functions.omega, Functions.omegaRange]
+    functions = [Functions.omega, Functions.omegaRange, Functions.omegaBatch, Functions.OmegaIncremental]
+    # omega over a full history: returns is a (days x strategies) matrix, dimensions must match its columns
+    # functions = OmegaSeries(returns, threshold=0).functions()
+    # exact reference, its optimum can also seed the PSO swarm: pso.seed([lp.solve()])
+    # lp = AlgorithmLp(func=functions, lfp=Functions.omegaLfp, dimensions=dimensions, budget=None)
     algos.extend([
         # Algorithm(func=functions, precision=precision, dimensions=dimensions, doForever=0,
         #           steps=steps * pop_size, repeats=pop_size * (gen_no + 5 * gen_grace), optimumIsMinimum=False),
@@ -142,7 +149,8 @@ def main():
         style=style,
         contrast=1,
         algorithms=algos,
-        redraw_mesh_on_restart=True)
+        redraw_mesh_on_restart=True,
+        target_frame_time=1 / 30)
     app.run()
 
 
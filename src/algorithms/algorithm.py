@@ -1,10 +1,21 @@
 import math
 import operator
 import random
+import time
 import numpy as np, numpy.random
 
+from src.algorithms.bounds import scaleToSimplex
+from src.algorithms.cache import EvalCache
+from src.algorithms.recorder import PointRecorder
+
 
 class Algorithm:
+    # the solveStep phases timed by setProfiling(True); nested phases (e.g. decode inside evalPop) are counted in both
+    phases = ['generateCandidate', 'decode', 'eval', 'decodeBatch', 'evalBatch']
+    # smallest funcInc.evalSize for which incremental='auto' uses the incremental evaluation when there is a batch
+    # function too; measured on return series, the one by one moves only win from about a thousand days on
+    incrementalMinSize = 1024
+
     def __init__(
             self,
             func,
@@ -13,9 +24,34 @@ class Algorithm:
             dimensions=2,
             steps=1,
             doForever=0,
-            repeats=1):
+            repeats=1,
+            cacheSize=0,
+            budget=None,
+            gray=False,
+            incremental='auto'):
         self.func = func[0]
         self.dimRange = func[1]
+        # optional: evaluates a whole (pop_size, dimensions) matrix in one call
+        self.funcBatch = func[2] if len(func) > 2 else None
+        # optional: incremental evaluation when a single dimension changes, an object with
+        # init(values) -> state, eval(state, dim, value) -> evaluation, apply(state, dim, value), and evalSize: about
+        # how many values one eval touches (e.g. the days of a return series)
+        self.funcInc = func[3] if len(func) > 3 else None
+        # incremental: whether single bit moves go through funcInc, True, False or 'auto' (by evalSize, see
+        # incrementalMinSize). The two paths aren't bit-identical, the evaluations differ in the last bits, so ties
+        # between neighbours can break the other way and a seeded run takes another trajectory
+        if incremental not in ('auto', True, False):
+            raise ValueError("incremental must be 'auto', True or False, got " + repr(incremental))
+        if incremental is True and self.funcInc is None:
+            raise ValueError('incremental=True needs an incremental function, func[3]')
+        if incremental is False or (incremental == 'auto' and self.funcBatch is not None and
+                                    getattr(self.funcInc, 'evalSize', 0) < self.incrementalMinSize):
+            self.funcInc = None
+        # fully invested, long-only mode: candidates are mapped onto {w >= 0, sum(w) = budget}
+        self.budget = budget
+        if budget is not None:
+            # a single bit now moves every weight, the incremental evaluation doesn't apply
+            self.funcInc = None
         self.dimIntervalLength = self.dimRange[1] - self.dimRange[0]
         self.optimumIsMinimum = optimumIsMinimum
         if optimumIsMinimum:
@@ -36,17 +72,36 @@ class Algorithm:
         )
         self.candidateBitSize = self.dimensions * self.dimensionBitSize
         self.dimMaxInt = 2 ** self.dimensionBitSize - 1
+        # weight of every bit inside a dimension, most significant first, for decodeBatch
+        self.bitWeights = 2.0 ** np.arange(self.dimensionBitSize - 1, -1, -1)
+        # Gray coded dimensions: neighbouring values differ by a single bit, so one-bit moves stay local
+        self.gray = gray
         self.candidate = None
         self.be = self.optInit  # best eval
         self.bb = None  # bitstring
         self.bv = []  # values
         self.bstep = 0  # at which eval did we achieve this best
         self.br = 0  # repeat when best was found
-        self.exploredPoints = []
+        # every evaluated point, [e, *values], for the visualisation; see setRecording
+        self.exploredPoints = PointRecorder(dimensions, optimumIsMinimum=optimumIsMinimum)
         self.evals = 0
         self.repeats = repeats
         self.repCurr = 0
         self.doForever = doForever
+        self.restarts = 0  # how many times restart() was called
+        # convergence signals of the population algorithms, see updateConvergence
+        self.minDiversity = 0
+        self.convergencePatience = 10  # generations the diversity has to stay under minDiversity
+        self.diversity = None  # of the last generation, in [0, 1]
+        self.lowSince = None  # evals when the current streak of generations under minDiversity began
+        self.lowGens = 0
+        self.convergedAt = None  # evals when the streak which made this run converged began
+        self.wastedEvalsDone = 0  # evals spent after convergence by the runs before restart()
+        self.phaseStats = {}  # phase -> [total seconds, calls], only while profiling
+        # evaluation backend for evalBatch, see setEvaluator; None evaluates in place
+        self.evaluator = None
+        # optional memo of bitstring -> evaluation, cache hits don't count as evals; emptied by restart()
+        self.cache = EvalCache(cacheSize) if cacheSize > 0 else None
 
     def __str__(self):
         return self.getName() + ' ' + self.func.__doc__
@@ -54,6 +109,85 @@ class Algorithm:
     def getName(self):
         return 'Random Search Algorithm (Binary)'
 
+    def setProfiling(self, on=True):
+        """times every phase in self.phases; the timed versions shadow the methods on this instance only, so
+        switching profiling off restores the plain methods and costs nothing"""
+        for name in self.phases:
+            if on and name not in self.__dict__:
+                setattr(self, name, self.timed(name, getattr(self, name)))
+            elif not on:
+                self.__dict__.pop(name, None)
+
+    def setRecording(self, mode='full', every=1, capacity=1 << 16):
+        """what to keep of the evaluated points in exploredPoints: 'full', 'nth' (every `every`-th), 'improvements'
+        or 'off', in a ring buffer of capacity points, see PointRecorder; headless runs don't need them at all"""
+        self.exploredPoints = PointRecorder(self.dimensions, mode, every, capacity, self.optimumIsMinimum)
+
+    def setEvaluator(self, evaluator=None):
+        """evaluates every batch through evaluator (see src.algorithms.evaluator), e.g. ProcessEvaluator() for an
+        expensive objective; the evaluations always come back in population order. None evaluates in place"""
+        if self.evaluator is not None and self.evaluator is not evaluator:
+            self.evaluator.close()
+        self.evaluator = evaluator
+
+    def timed(self, name, f):
+        stats = self.phaseStats.setdefault(name, [0.0, 0])
+        clock = time.perf_counter
+
+        def timedPhase(*args, **kwargs):
+            t = clock()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                stats[0] += clock() - t
+                stats[1] += 1
+
+        return timedPhase
+
+    def updateConvergence(self, diversity):
+        """called once per generation with its diversity; the run has converged once the diversity stayed under
+        minDiversity for convergencePatience generations in a row"""
+        self.diversity = diversity
+        if self.convergedAt is not None:
+            return
+        if diversity >= self.minDiversity:
+            self.lowSince = None
+            self.lowGens = 0
+            return
+        if self.lowSince is None:
+            self.lowSince = self.evals
+        self.lowGens += 1
+        if self.lowGens >= self.convergencePatience:
+            self.convergedAt = self.lowSince
+
+    def resetConvergence(self):
+        """for restart(): the evals after convergence of the finished run are kept in the totals"""
+        if self.convergedAt is not None:
+            self.wastedEvalsDone += self.evals - self.convergedAt
+        self.diversity = None
+        self.lowSince = None
+        self.lowGens = 0
+        self.convergedAt = None
+
+    def getConvergenceStats(self):
+        """diversity of the last generation, evals at convergence (None if not converged) and the evals spent after
+        it, in this run and over all runs"""
+        wasted = 0 if self.convergedAt is None else self.evals - self.convergedAt
+        return {'diversity': self.diversity, 'minDiversity': self.minDiversity, 'convergedAt': self.convergedAt,
+                'wastedEvals': wasted, 'totalWastedEvals': self.wastedEvalsDone + wasted}
+
+    def getPhaseStats(self):
+        """phase -> {'time': total seconds, 'calls': calls} accumulated while profiling"""
+        return {k: {'time': v[0], 'calls': v[1]} for k, v in self.phaseStats.items()}
+
+    def resetPhaseStats(self):
+        for v in self.phaseStats.values():
+            v[0] = 0.0
+            v[1] = 0
+
+    def formatPhaseStats(self):
+        return ' | '.join('%s %.1fms/%d' % (k, v[0] * 1000, v[1]) for k, v in self.phaseStats.items() if v[1])
+
     def gimmeSomeEval(self):
         c0 = [self.dimRange[0]] * self.dimensions
         c1 = [self.dimRange[1]] * self.dimensions
@@ -95,21 +229,139 @@ class Algorithm:
             values[ii] = self.decodeDimension(candidate[a0:a1])
             a0 = a1
             a1 += self.dimensionBitSize
+        if self.budget is not None:
+            values = scaleToSimplex(values, self.dimRange, self.budget).tolist()
         return values
 
     def decodeDimension(self, dimensionBits):
         s = 0
         for b in dimensionBits:
             s = (s << 1) | b
+        return self.decodeInt(s)
+
+    def decodeInt(self, s):
+        if self.gray:
+            m = s >> 1
+            while m:
+                s ^= m
+                m >>= 1
         v = s / self.dimMaxInt * self.dimIntervalLength + self.dimRange[0]
         return (v)
 
+    def decodeBatch(self, bits):
+        """(pop_size, candidateBitSize) matrix of 0/1 bits -> (pop_size, dimensions) array of values"""
+        b = np.asarray(bits, dtype=np.uint8).reshape(-1, self.dimensions, self.dimensionBitSize)
+        if self.gray:
+            b = np.bitwise_xor.accumulate(b, axis=2)
+        values = (b @ self.bitWeights) / self.dimMaxInt * self.dimIntervalLength + self.dimRange[0]
+        if self.budget is not None:
+            values = scaleToSimplex(values, self.dimRange, self.budget)
+        return values
+
     def eval(self, values):
-        self.evals += 1
+        if self.evaluator is not None:
+            return self.evalBatch([values])[0]
+        # a single point: calling func directly spares building the arrays of evalBatch
         e = self.func(values)
-        self.exploredPoints.append([e, *values])
+        self.evals += 1
+        self.exploredPoints.recordOne(e, values)
         return e
 
+    def evalBatch(self, pop):
+        """evaluates every row of a (pop_size, dimensions) matrix, returns an array of evaluations"""
+        pop = np.asarray(pop, dtype=np.float64)
+        if self.evaluator is not None:
+            es = self.evaluator(self.func, self.funcBatch, pop)
+        elif self.funcBatch is None:
+            es = np.array([self.func(v) for v in pop.tolist()], dtype=np.float64)
+        else:
+            es = np.asarray(self.funcBatch(pop), dtype=np.float64)
+        self.evals += len(pop)
+        self.exploredPoints.record(es, pop)
+        return es
+
+    def evalCandidate(self, candidate, key=None):
+        """decodes and evaluates a bitstring, through the evaluation cache if enabled; returns (e, values)
+        key is the packed candidate, if the caller already has it"""
+        if self.cache is None:
+            v = self.decode(candidate)
+            return self.eval(v), v
+        if key is None:
+            key = self.cache.key(candidate)
+        hit = self.cache.get(key)
+        if hit is not None:
+            e, v = hit
+            self.exploredPoints.recordOne(e, v)
+            return e, list(v)
+        v = self.decode(candidate)
+        e = self.eval(v)
+        self.cache.put(key, e, v)
+        return e, v
+
+    def evalCandidates(self, pop):
+        """decodes and evaluates a (pop_size, candidateBitSize) matrix (or list) of bitstrings as a single batch;
+        returns the values, the evaluations and, for each candidate, the evals counter right after it was
+        evaluated"""
+        if self.cache is None:
+            popV = self.decodeBatch(pop)
+            es = self.evalBatch(popV)
+            return popV, es, range(self.evals - len(pop) + 1, self.evals + 1)
+        keys = [self.cache.key(c) for c in pop]
+        found = {}
+        todo = {}  # key -> index of the first candidate with it, for the ones we have to evaluate
+        for ii, k in enumerate(keys):
+            if k in found or k in todo:
+                self.cache.hits += 1  # duplicate inside the batch
+                continue
+            hit = self.cache.get(k)
+            if hit is None:
+                todo[k] = ii
+            else:
+                found[k] = hit
+        if todo:
+            vs = self.decodeBatch([pop[ii] for ii in todo.values()])
+            for k, e, v in zip(todo, self.evalBatch(vs).tolist(), vs.tolist()):
+                self.cache.put(k, e, v)
+                found[k] = (e, v)
+        popV = []
+        es = []
+        steps = []
+        step = self.evals - len(todo)
+        for ii, k in enumerate(keys):
+            e, v = found[k]
+            if todo.get(k) == ii:
+                step += 1
+            else:
+                self.exploredPoints.recordOne(e, v)
+            popV.append(v)
+            es.append(e)
+            steps.append(step)
+        return np.array(popV, dtype=np.float64), np.array(es, dtype=np.float64), steps
+
+    def evalMove(self, state, values, dim, value, key=None):
+        """evaluates values with values[dim] replaced by value, using the incremental state of values
+        key is the packed bitstring of the move, for the evaluation cache"""
+        v = values[:]
+        v[dim] = value
+        if self.cache is not None:
+            hit = self.cache.get(key)
+            if hit is not None:
+                e = hit[0]
+                self.exploredPoints.recordOne(e, v)
+                return e, v
+        self.evals += 1
+        e = self.funcInc.eval(state, dim, value)
+        self.exploredPoints.recordOne(e, v)
+        if self.cache is not None:
+            self.cache.put(key, e, v)
+        return e, v
+
+    def getOptIdx(self, es):
+        """index of the first best evaluation, same as a sequential scan using self.cmp"""
+        if self.optimumIsMinimum:
+            return int(np.argmin(es))
+        return int(np.argmax(es))
+
     def restart(self):
         self.candidate = None
         self.be = self.optInit  # best eval
@@ -117,10 +369,18 @@ class Algorithm:
         self.bv = []  # values
         self.bstep = 0  # at which eval did we achieve this best
         self.br = 0  # repeat when best was found
-        self.exploredPoints = []
+        self.exploredPoints.reset()
+        self.clearCache()
         self.evals = 0
+        self.restarts += 1
         self.repCurr = 0
 
+    def clearCache(self):
+        """for restart(): a hit on a point of the previous run would be an evaluation the new run gets for free,
+        its evals count from 0 again"""
+        if self.cache is not None:
+            self.cache.clear()
+
     def solveStep(self):
         if self.repCurr >= self.repeats:
             if self.doForever:
@@ -129,8 +389,7 @@ class Algorithm:
                 return ()
         self.repCurr += 1
         self.candidate = self.generateCandidate()
-        v = self.decode(self.candidate)
-        e = self.eval(v)
+        e, v = self.evalCandidate(self.candidate)
         if self.cmp(e, self.be):
             self.br = self.repCurr - 1
             self.be = e
@@ -139,7 +398,9 @@ class Algorithm:
             self.bstep = self.evals
 
     def run(self):
-        self.exploredPoints = []
+        """steps solveStep steps times, returns the points recorded meanwhile (see setRecording), a view that is only
+        valid until the next run"""
+        self.exploredPoints.clear()
         for ii in range(self.steps):
             self.solveStep()
-        return (self.exploredPoints)
+        return (self.exploredPoints.points())
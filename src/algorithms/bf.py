@@ -1,49 +1,144 @@
+import copy
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
 from src.algorithms.algorithm import Algorithm
 
 
+def solveRange(alg, start, end, deadline=None):
+    """enumerates [start, end) of the grid with a copy of alg, in a worker process, stopping after the chunk during
+    which time.time() passes deadline; returns (be, bb, bv, bstep, next), next: the first index not enumerated"""
+    alg.start = start
+    alg.end = end
+    alg.restart()
+    alg.setRecording('off')  # nobody looks at them
+    while (deadline is None or time.time() < deadline) and alg.solveStep() != ():
+        pass
+    return alg.be, alg.bb, alg.bv, alg.bstep, alg.next
+
+
 class AlgorithmBf(Algorithm):
+    phases = ['indexBits', 'decodeBatch', 'evalBatch']
+
+    # the grid index of a candidate is its bitstring read as a binary number, least significant bit first, i.e.
+    # candidate[ii] = (index >> ii) & 1; every solveStep enumerates the next chunkSize indexes as one batch
+    # start, end: the index range to enumerate, end defaults to the whole grid (1 << candidateBitSize); next is the
+    # index the following solveStep starts at, so a run can be resumed with start=alg.next
+    def __init__(
+            self,
+            func,
+            optimumIsMinimum=True,
+            precision=5,
+            dimensions=2,
+            steps=1,
+            doForever=0,
+            cacheSize=0,
+            budget=None,
+            gray=False,
+            chunkSize=1 << 14,
+            start=0,
+            end=None):
+        # every point is visited once, an evaluation cache would only cost memory
+        super().__init__(func, optimumIsMinimum, precision, dimensions, steps, doForever, budget=budget, gray=gray)
+        self.chunkSize = chunkSize
+        self.start = start
+        self.end = 1 << self.candidateBitSize if end is None else min(end, 1 << self.candidateBitSize)
+        self.next = start
+        self.repeats = self.end - self.start
+
     def getName(self):
         return ('Brute Force Algorithm (Binary)')
 
     def restart(self):
-        self.candidate = [0] * self.candidateBitSize
+        self.next = self.start
         self.be = self.optInit  # best eval
         self.bb = None  # bitstring
         self.bv = []  # values
         self.bstep = 0  # at which eval did we achieve this best
         self.br = 0  # repeat when best was found
-        self.exploredPoints = []
+        self.exploredPoints.reset()
         self.evals = 0
+        self.restarts += 1
         self.repCurr = 0
-        self.cr = 0
+
+    def indexBits(self, idx):
+        """grid indexes -> (len(idx), candidateBitSize) bit matrix; indexes are int64, so only the lowest 63 bits
+        can be set, which is far beyond anything that can be enumerated anyway"""
+        n = min(self.candidateBitSize, 63)
+        bits = np.zeros((len(idx), self.candidateBitSize), dtype=np.uint8)
+        bits[:, :n] = (idx[:, None] >> np.arange(n)) & 1
+        return bits
 
     def solveStep(self):
-        if self.candidate is None:
-            self.candidate = [0] * self.candidateBitSize
-            self.cr = 0
-            self.repeats = 1 << self.candidateBitSize
+        if self.next >= self.end:
+            if not self.doForever:
+                return ()
+            self.restart()
+        stop = min(self.next + self.chunkSize, self.end)
+        bits = self.indexBits(np.arange(self.next, stop, dtype=np.int64))
+        popV = self.decodeBatch(bits)
+        es = self.evalBatch(popV)
+        ib = self.getOptIdx(es)
+        if self.cmp(es[ib], self.be):
+            self.be = float(es[ib])
+            self.bb = bits[ib].tolist()
+            self.bv = popV[ib].tolist()
+            self.bstep = self.evals - len(es) + ib + 1
+            self.br = self.next + ib - self.start
+        self.next = stop
+        self.repCurr = self.next - self.start
+
+    def solveParallel(self, processes=None, maxEvals=None, maxTime=None):
+        """enumerates the rest of the range, [next, end), split into disjoint ranges on a process pool, and merges
+        the best of them into this algorithm; returns (be, bv)
+        maxEvals: enumerate at most that many indexes; maxTime: seconds, the range is then handed out in ranges of
+        16 chunks, in order, until the time is up, and the workers stop after the chunk they are at. next becomes
+        the first index not enumerated of the first unfinished range, so a resumed run repeats at most the few
+        ranges that were in flight
+        the algorithm is pickled to the workers, so it must not be profiling"""
+        processes = processes or os.cpu_count()
+        end = self.end if maxEvals is None else min(self.end, self.next + maxEvals)
+        deadline = None if maxTime is None else time.time() + maxTime
+        if deadline is None:
+            cuts = np.linspace(self.next, end, processes + 1).round().astype(np.int64).tolist()
         else:
-            if self.cr == 1:
-                self.restart()
-                if not self.doForever:
-                    self.cr = 1
-                    return ()
-            self.repCurr += 1
-            cr = 1
-            for ii, _ in enumerate(self.candidate):
-                if cr == 0:
+            cuts = list(range(self.next, end, 16 * self.chunkSize)) + [end]
+        ranges = [(a, b) for a, b in zip(cuts, cuts[1:]) if b > a]
+        worker = copy.copy(self)
+        worker.setRecording('off')
+        results = []
+        if processes == 1:
+            for a, b in ranges:
+                if deadline is not None and time.time() >= deadline:
                     break
-                cr = 0
-                self.candidate[ii] += 1
-                if self.candidate[ii] > 1:
-                    self.candidate[ii] = 0
-                    cr = 1
-            self.cr = cr
-        v = self.decode(self.candidate)
-        e = self.eval(v)
-        if self.cmp(e, self.be):
-            self.be = e
-            self.bb = self.candidate[:]
-            self.bv = v
-            self.bstep = self.evals
-            self.br = self.repCurr
+                results.append(solveRange(copy.deepcopy(worker), a, b, deadline))
+        elif ranges:
+            with ProcessPoolExecutor(processes) as pool:
+                pending = deque()
+                for a, b in ranges:
+                    if deadline is not None and time.time() >= deadline:
+                        break
+                    pending.append(pool.submit(solveRange, worker, a, b, deadline))
+                    if len(pending) >= 2 * processes:
+                        results.append(pending.popleft().result())
+                results.extend(f.result() for f in pending)
+        done = self.evals  # evals before each range, in index order
+        resume = end if len(results) == len(ranges) else ranges[len(results)][0]
+        for (a, b), (be, bb, bv, bstep, reached) in zip(ranges, results):
+            if bb is not None and self.cmp(be, self.be):
+                self.be = be
+                self.bb = bb
+                self.bv = bv
+                self.bstep = done + bstep
+                self.br = a + bstep - 1 - self.start
+            done += reached - a
+            if reached < b:
+                resume = min(resume, reached)
+        self.evals = done
+        self.next = resume
+        self.repCurr = self.next - self.start
+        return self.be, self.bv
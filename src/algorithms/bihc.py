@@ -1,7 +1,16 @@
+import numpy as np
+
 from src.algorithms.algorithm import Algorithm
 
 
 class AlgorithmBihc(Algorithm):
+    phases = ['generateCandidate', 'getBestMut', 'decode', 'eval', 'decodeBatch', 'evalBatch', 'evalMove']
+
+    # firstImprovement: move to the first better neighbour found instead of scanning the whole neighbourhood; without
+    # an incremental function the neighbours are evaluated in batches of dimensionBitSize and the best of the first
+    # batch with an improvement is taken
+    # randomOrder: scan the neighbours (bit positions) in a new random order every step
+
     def __init__(
             self,
             func,
@@ -10,15 +19,27 @@ class AlgorithmBihc(Algorithm):
             dimensions=2,
             steps=1,
             repeats=10000,
-            doForever=0):
-        super().__init__(func, optimumIsMinimum, precision, dimensions, steps, doForever)
+            doForever=0,
+            cacheSize=0,
+            budget=None,
+            gray=False,
+            incremental='auto',
+            firstImprovement=False,
+            randomOrder=False):
+        super().__init__(func, optimumIsMinimum, precision, dimensions, steps, doForever,
+                         cacheSize=cacheSize, budget=budget, gray=gray, incremental=incremental)
         self.repeats = repeats
+        self.firstImprovement = firstImprovement
+        self.randomOrder = randomOrder
         self.ce = 0  # current eval
         self.cv = []  # current values
         self.tbe = 0  # temp best eval, position
         self.tbp = 0
+        self.cs = None  # incremental evaluation state of the current candidate
 
     def getName(self):
+        if self.firstImprovement:
+            return ('First Improvement Hill-Climbing Algorithm (Binary)')
         return ('Best Improvement Hill-Climbing Algorithm (Binary)')
 
     def restart(self):
@@ -28,40 +49,99 @@ class AlgorithmBihc(Algorithm):
         self.bv = []  # values
         self.bstep = 0  # at which eval did we achieve this best
         self.br = 0  # repeat when best was found
-        self.exploredPoints = []
+        self.exploredPoints.reset()
+        self.clearCache()
         self.evals = 0
+        self.restarts += 1
         self.repCurr = 0
         self.ce = 0
         self.cv = []
+        self.cs = None
+
+    def neighbourOrder(self, n):
+        if self.randomOrder:
+            return np.random.permutation(n)
+        return np.arange(n)
+
+    def getBestMut(self, c, state=None, ce=None):
+        """best one bit flip of c: (eval, bit position, values), position -1 if there is none
+        ce is the eval of c, needed for firstImprovement; the Hamming-1 neighbourhood is built as a bit matrix and
+        decoded and evaluated as a batch"""
+        if self.funcInc is not None:
+            return self.getBestMutInc(c, state, ce)
+        tbe = self.optInit
+        tbp = -1
+        tbv = []
+        order = self.neighbourOrder(len(c))
+        first = self.firstImprovement and ce is not None
+        chunk = self.dimensionBitSize if first else len(c)
+        base = np.array(c, dtype=np.uint8)
+        for start in range(0, len(c), chunk):
+            pos = order[start:start + chunk]
+            neighbours = np.tile(base, (len(pos), 1))
+            neighbours[np.arange(len(pos)), pos] ^= 1
+            popV, es, _ = self.evalCandidates(neighbours)
+            ib = self.getOptIdx(es)
+            if self.cmp(es[ib], tbe):
+                tbe = float(es[ib])
+                tbp = int(pos[ib])
+                tbv = popV[ib].tolist()
+            if first and self.cmp(tbe, ce):
+                break
+        return (tbe, tbp, tbv)
 
-    def getBestMut(self, c):
+    def getBestMutInc(self, c, state=None, ce=None):
+        """same scan as getBestMut, but every neighbour only changes one dimension, so it is evaluated as
+        a delta on the incremental state of c instead of being decoded and evaluated from scratch"""
+        cv = self.decode(c)
+        if state is None:
+            state = self.funcInc.init(cv)
         tbe = self.optInit
         tbp = -1
         tbv = []
-        for ii in range(len(c)):
-            c[ii] = 1 - c[ii]
-            tv = self.decode(c)
-            te = self.eval(tv)
-            if self.cmp(te, self.tbe):
+        k = self.cache.key(c) if self.cache is not None else None
+        top = len(c) - 1
+        dbs = self.dimensionBitSize
+        first = self.firstImprovement and ce is not None
+        dimInts = []
+        for dim in range(self.dimensions):
+            s = 0
+            for b in c[dim * dbs:(dim + 1) * dbs]:
+                s = (s << 1) | b
+            dimInts.append(s)
+        for ii in self.neighbourOrder(len(c)).tolist():
+            dim, jj = divmod(ii, dbs)
+            te, tv = self.evalMove(state, cv, dim, self.decodeInt(dimInts[dim] ^ (1 << (dbs - 1 - jj))),
+                                   None if k is None else k ^ (1 << (top - ii)))
+            if self.cmp(te, tbe):
                 tbe = te
                 tbp = ii
                 tbv = tv
-            c[ii] = 1 - c[ii]  # reset the change
+                if first and self.cmp(tbe, ce):
+                    break
         return (tbe, tbp, tbv)
 
+    def applyMut(self, c, state, pos, values):
+        """flips bit pos of c in place and moves the incremental state along"""
+        c[pos] = 1 - c[pos]
+        if state is not None:
+            dim = pos // self.dimensionBitSize
+            self.funcInc.apply(state, dim, values[dim])
+
     def solveStep(self):
         if self.repCurr >= self.repeats and self.doForever == 0:
             return ()
         if self.candidate is None:
             self.repCurr += 1
             self.candidate = self.generateCandidate()
-            self.cv = self.decode(self.candidate)
-            self.ce = self.eval(self.cv)
-        self.tbe, self.tbp, self.tbv = self.getBestMut(self.candidate)
+            self.ce, self.cv = self.evalCandidate(self.candidate)
+            if self.funcInc is not None:
+                self.cs = self.funcInc.init(self.cv)
+        self.tbe, self.tbp, self.tbv = self.getBestMut(self.candidate, self.cs, self.ce)
         if self.cmp(self.tbe, self.ce):
             self.ce = self.tbe
             self.cv = self.tbv
-            self.candidate[self.tbp] = 1 - self.candidate[self.tbp]
+            self.applyMut(self.candidate, self.cs, self.tbp, self.tbv)
         else:
             if self.cmp(self.ce, self.be):
                 self.be = self.ce
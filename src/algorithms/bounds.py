@@ -0,0 +1,58 @@
+import numpy as np
+
+
+# boundary handlers for position based algorithms (AlgorithmPso)
+# handler(pos, vel, dimRange, budget) -> (pos, vel), pos and vel are (pop_size, dimensions) arrays, pos already
+# includes the velocity step
+
+
+def clampBoundary(pos, vel, dimRange, budget=None):
+    """clamps to dimRange, the velocity of a clamped coordinate is zeroed"""
+    out = (pos < dimRange[0]) | (pos > dimRange[1])
+    return np.clip(pos, dimRange[0], dimRange[1]), np.where(out, 0, vel)
+
+
+def reflectBoundary(pos, vel, dimRange, budget=None):
+    """mirrors coordinates back inside dimRange, the velocity of a reflected coordinate changes sign"""
+    lo, hi = dimRange
+    length = hi - lo
+    out = (pos < lo) | (pos > hi)
+    x = np.mod(pos - lo, 2 * length)
+    x = np.where(x > length, 2 * length - x, x)
+    return lo + x, np.where(out, -vel, vel)
+
+
+def simplexBoundary(pos, vel, dimRange, budget=1):
+    """projects onto the fully invested, long-only set {w >= 0, sum(w) = budget}
+    the velocity becomes the step that was actually taken"""
+    p = projectSimplex(pos, budget)
+    return p, vel + (p - pos)
+
+
+boundaries = {
+    'clamp': clampBoundary,
+    'reflect': reflectBoundary,
+    'simplex': simplexBoundary,
+}
+
+
+def projectSimplex(x, budget=1):
+    """euclidean projection of every row of x onto {w >= 0, sum(w) = budget}, sort based, O(n log n) per row"""
+    x = np.atleast_2d(np.asarray(x, dtype=np.float64))
+    n = x.shape[1]
+    u = -np.sort(-x, axis=1)
+    css = np.cumsum(u, axis=1) - budget
+    k = np.arange(1, n + 1)
+    # rho: the last (sorted) index still above the threshold, there is always at least one
+    rho = n - 1 - np.argmax((u - css / k > 0)[:, ::-1], axis=1)
+    theta = css[np.arange(len(x)), rho] / (rho + 1)
+    return np.maximum(x - theta[:, None], 0)
+
+
+def scaleToSimplex(values, dimRange, budget=1):
+    """maps points of the dimRange box onto {w >= 0, sum(w) = budget} by normalising their offsets from dimRange[0]
+    works on a single point or on a (pop_size, dimensions) matrix; the all-zero offset maps to equal weights"""
+    u = np.asarray(values, dtype=np.float64) - dimRange[0]
+    s = u.sum(axis=-1, keepdims=True)
+    ok = s > 0
+    return np.where(ok, u / np.where(ok, s, 1), 1 / u.shape[-1]) * budget
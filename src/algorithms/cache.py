@@ -0,0 +1,49 @@
+from collections import OrderedDict
+
+_bitChars = bytes.maketrans(b'\x00\x01', b'01')
+
+
+class EvalCache:
+    """bounded LRU memo of bitstring -> (evaluation, values)
+
+    bitstrings are stored packed into a single int, see key()"""
+
+    def __init__(self, size=4096):
+        self.size = size
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    @staticmethod
+    def key(bits):
+        """packs a list of 0/1 ints into an int, most significant bit first"""
+        if not len(bits):
+            return 0
+        return int(bytes(bits).translate(_bitChars), 2)
+
+    def get(self, key):
+        """(evaluation, values) for a packed bitstring, or None on a miss"""
+        r = self.data.get(key)
+        if r is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.data.move_to_end(key)
+        return r
+
+    def put(self, key, e, values):
+        self.data[key] = (e, tuple(values))
+        self.data.move_to_end(key)
+        if len(self.data) > self.size:
+            self.data.popitem(last=False)
+
+    def clear(self):
+        self.data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def getStats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.data), 'maxSize': self.size}
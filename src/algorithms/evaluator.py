@@ -0,0 +1,136 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+
+# evaluation backends for Algorithm.evalBatch, see Algorithm.setEvaluator
+# evaluator(func, funcBatch, pop) -> (pop_size,) array of evaluations, always in population order; a population is
+# split into contiguous chunks, one task each, and populations smaller than minRows are evaluated in place
+# every evaluator is built as evaluator(workers, chunkSize, minRows), workers defaults to the cpu count
+
+
+def evalRows(func, funcBatch, pop):
+    """evaluates every row of pop in the calling thread, with funcBatch if there is one"""
+    if funcBatch is None:
+        return np.array([func(v) for v in pop.tolist()], dtype=np.float64)
+    return np.asarray(funcBatch(pop), dtype=np.float64)
+
+
+def splitRows(pop, workers, chunkSize=None):
+    """contiguous chunks of pop, chunkSize rows each or one per worker"""
+    if chunkSize is None:
+        chunkSize = math.ceil(len(pop) / workers)
+    return [pop[ii:ii + chunkSize] for ii in range(0, len(pop), chunkSize)]
+
+
+class SerialEvaluator:
+    """evaluates in the calling thread, same as no evaluator at all"""
+
+    def __init__(self, workers=None, chunkSize=None, minRows=None):
+        pass
+
+    def __call__(self, func, funcBatch, pop):
+        return evalRows(func, funcBatch, pop)
+
+    def close(self):
+        pass
+
+
+class ThreadEvaluator:
+    """evaluates the chunks on a thread pool; only pays off for objectives that release the GIL, e.g. the large
+    matrix products of OmegaSeries"""
+
+    def __init__(self, workers=None, chunkSize=None, minRows=64):
+        self.workers = workers or os.cpu_count()
+        self.chunkSize = chunkSize
+        self.minRows = minRows
+        self.pool = None
+
+    def __call__(self, func, funcBatch, pop):
+        if len(pop) < self.minRows or self.workers == 1:
+            return evalRows(func, funcBatch, pop)
+        if self.pool is None:
+            self.pool = ThreadPoolExecutor(self.workers)
+        chunks = splitRows(pop, self.workers, self.chunkSize)
+        return np.concatenate(list(self.pool.map(evalRows, [func] * len(chunks), [funcBatch] * len(chunks), chunks)))
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def __getstate__(self):
+        # a copy (e.g. for MultiStart) starts its own pool
+        state = self.__dict__.copy()
+        state['pool'] = None
+        return state
+
+
+# the functions of the ProcessEvaluator worker processes, sent once per worker by the pool initializer
+_workerFuncs = None
+
+
+def initWorker(func, funcBatch):
+    global _workerFuncs
+    _workerFuncs = (func, funcBatch)
+
+
+def evalWorkerRows(pop):
+    return evalRows(_workerFuncs[0], _workerFuncs[1], pop)
+
+
+class ProcessEvaluator:
+    """evaluates the chunks on a process pool
+
+    the functions are pickled once per worker process, not per task, so only the population chunks travel; an
+    objective with a shareMemory() method (e.g. OmegaSeries) is first moved into shared memory, so the workers attach
+    to its data instead of each getting a copy. The functions must be picklable and must not change afterwards: the
+    pool is only restarted when different functions are passed"""
+
+    def __init__(self, workers=None, chunkSize=None, minRows=64):
+        self.workers = workers or os.cpu_count()
+        self.chunkSize = chunkSize
+        self.minRows = minRows
+        self.pool = None
+        self.funcs = None
+        self.shared = []  # objectives moved into shared memory by us, released on close()
+
+    def __call__(self, func, funcBatch, pop):
+        if len(pop) < self.minRows:
+            return evalRows(func, funcBatch, pop)
+        if self.pool is None or self.funcs != (func, funcBatch):
+            self.start(func, funcBatch)
+        chunks = splitRows(pop, self.workers, self.chunkSize)
+        return np.concatenate(list(self.pool.map(evalWorkerRows, chunks)))
+
+    def start(self, func, funcBatch):
+        self.close()
+        for f in (func, funcBatch):
+            objective = getattr(f, '__self__', None)
+            if hasattr(objective, 'shareMemory') and objective not in self.shared and objective.shareMemory():
+                self.shared.append(objective)
+        self.funcs = (func, funcBatch)
+        self.pool = ProcessPoolExecutor(self.workers, initializer=initWorker, initargs=self.funcs)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+        for objective in self.shared:
+            objective.releaseMemory()
+        self.shared = []
+        self.funcs = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.update(pool=None, funcs=None, shared=[])
+        return state
+
+
+evaluators = {
+    'serial': SerialEvaluator,
+    'thread': ThreadEvaluator,
+    'process': ProcessEvaluator,
+}
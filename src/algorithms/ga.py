@@ -1,11 +1,15 @@
 import math
-import operator
 import random
 
+import numpy as np
+
 from src.algorithms.bihc import AlgorithmBihc
+from src.algorithms.selection import selections
 
 
 class AlgorithmGa(AlgorithmBihc):
+    phases = ['generatePop', 'mutation', 'crossOver', 'evalPop', 'selection', 'decodeBatch', 'evalBatch']
+
     def __init__(
             self,
             func,
@@ -19,7 +23,14 @@ class AlgorithmGa(AlgorithmBihc):
             pm=0.01,
             pcx=0.2,
             selPressure=1,
-            doForever=0):
+            doForever=0,
+            cacheSize=0,
+            budget=None,
+            gray=False,
+            incremental='auto',
+            selMethod='roulette',
+            minDiversity=0.01,
+            convergenceStop=False):
         super().__init__(
             func,
             optimumIsMinimum,
@@ -27,21 +38,37 @@ class AlgorithmGa(AlgorithmBihc):
             dimensions,
             steps,
             0,
-            doForever)
+            doForever,
+            cacheSize,
+            budget,
+            gray,
+            incremental)
         self.popSize = popSize
         self.genNo = genNo
         self.repeats = self.genNo
         self.genGrace = genGrace
         self.genCurr = 0
         self.pm = pm
+        self.skipSamplingPm = 0.1
         self.pcx = pcx
+        # packed chromosomes: a (pop size, ceil(candidateBitSize / 8)) uint8 matrix, 8 bits per byte, most
+        # significant bit first; the padding bits of the last byte are always 0
         self.pop = None
+        self.popBytes = (self.candidateBitSize + 7) // 8
         self.popV = None  # population decoded values: X
         self.popE = None  # population evaluated values: f(X)
-        self.popF = None  # population fitnesses
+        self.popBits = None  # unpacked population, as evaluated
         self.genMin = math.inf
         self.genMax = -math.inf
+        # selMethod: a name from selection.selections or a function, see src.algorithms.selection; selPressure is
+        # the fitness exponent of 'roulette' and 'rank' and the tournament size of 'tournament'
         self.selPressure = selPressure
+        self.selMethod = selMethod
+        self.selector = selections[selMethod] if isinstance(selMethod, str) else selMethod
+        # diversity is the mean per-locus bit entropy of the selected population, under minDiversity it has converged;
+        # with convergenceStop the run then ends (or restarts) right away instead of waiting out genGrace
+        self.minDiversity = minDiversity
+        self.convergenceStop = convergenceStop
 
     def getName(self):
         return ('Genetic Algorithm (Binary), popSize = ' +
@@ -51,7 +78,13 @@ class AlgorithmGa(AlgorithmBihc):
                 ' pcx = ' +
                 str(self.pcx) +
                 ' selPressureExponent = ' +
-                str(self.selPressure))
+                str(self.selPressure) +
+                self.getSelName())
+
+    def getSelName(self):
+        if self.selMethod == 'roulette':
+            return ''
+        return ' selection = ' + (self.selMethod if isinstance(self.selMethod, str) else self.selMethod.__name__)
 
     def restart(self):
         self.genCurr = 0
@@ -63,13 +96,20 @@ class AlgorithmGa(AlgorithmBihc):
         self.bv = []  # values
         self.bstep = 0  # at which eval did we achieve this best
         self.br = 0  # repeat when best was found
-        self.exploredPoints = []
+        self.exploredPoints.reset()
+        self.resetConvergence()
+        self.clearCache()
         self.evals = 0
+        self.restarts += 1
         self.repCurr = 0
 
+    def isStagnant(self):
+        return self.convergenceStop and self.convergedAt is not None
+
     def solveStep(self):
-        if self.genCurr >= self.repeats:
-            if self.br > self.genCurr - self.genGrace:
+        stagnant = self.isStagnant()
+        if self.genCurr >= self.repeats or stagnant:
+            if not stagnant and self.br > self.genCurr - self.genGrace:
                 self.repeats += self.genGrace
             elif self.doForever == 1:
                 self.restart()
@@ -84,106 +124,92 @@ class AlgorithmGa(AlgorithmBihc):
         self.evalPop()
         self.pop = self.selection()
 
+    def pack(self, bits):
+        """0/1 bits (a list, or a matrix with one chromosome per row) -> packed chromosome(s)"""
+        return np.packbits(np.asarray(bits, dtype=np.uint8), axis=-1)
+
+    def unpack(self, packed):
+        """packed chromosome(s) -> (..., candidateBitSize) matrix of 0/1 bits"""
+        return np.unpackbits(packed, axis=-1, count=self.candidateBitSize)
+
     def evalPop(self):
-        self.popV = []
-        self.popE = []
-        self.genMin = math.inf
-        self.genMax = -math.inf
-        for c in self.pop:
-            v = self.decode(c)
-            e = self.eval(v)
-            if e < self.genMin:
-                self.genMin = e
-            if e > self.genMax:
-                self.genMax = e
-            if self.cmp(e, self.be):
-                self.be = e
-                self.bb = c
-                self.bv = v
-                self.bstep = self.evals
-                self.br = self.genCurr
-            self.popV.append(v)
-            self.popE.append(e)
+        bits = self.unpack(self.pop)
+        self.popBits = bits
+        self.popV, es, steps = self.evalCandidates(bits)
+        self.popE = es
+        self.genMin = float(es.min())
+        self.genMax = float(es.max())
+        ib = self.getOptIdx(es)
+        if self.cmp(es[ib], self.be):
+            self.be = float(es[ib])
+            self.bb = bits[ib].tolist()
+            self.bv = self.popV[ib].tolist()
+            self.bstep = steps[ib]
+            self.br = self.genCurr
+
+    def bitEntropy(self, bits):
+        """mean entropy of the bit at every locus over the population, 1: every bit is a fair coin, 0: all clones"""
+        p = bits.mean(axis=0)
+        p = p[(p > 0) & (p < 1)]
+        h = -(p * np.log2(p) + (1 - p) * np.log2(1 - p))
+        return float(h.sum() / bits.shape[1])
 
     def selection(self):
-        evalDistance = self.genMax - self.genMin
-        if evalDistance == 0:
-            evalDistance = 1
-        epsilon = evalDistance * 0.01
-        div = evalDistance / 2
-        newPop = []
-        self.popF = []
         if len(self.pop) == 0:
-            return ([])
-        for e in self.popE:
-            if self.optimumIsMinimum:
-                f = (self.genMax - e + epsilon) / div
-            else:
-                f = (e - self.genMin + epsilon) / div
-            f = math.pow(f, self.selPressure)
-            self.popF.append(f)
-        self.partialSums = [self.popF[0]]
-        for ii in range(1, len(self.popF)):
-            self.partialSums.append(self.partialSums[ii - 1] + self.popF[ii])
-        selectVal = []
-        for _ in range(self.popSize):
-            val = random.random() * self.partialSums[-1]
-            selectVal.append(val)
-        selectVal.sort()
-        lookStart = 0
-        for ii, ps in enumerate(self.partialSums):
-            for jj in range(lookStart, len(selectVal)):
-                if selectVal[jj] < ps:
-                    newPop.append(self.pop[ii])
-                    lookStart += 1
-                else:
-                    break
-        return (newPop)
+            return (self.pop)
+        newPop = self.selector(self.popE, self.popSize, self.optimumIsMinimum, self.selPressure)
+        # measured on the survivors: after mutation even a population of clones has the entropy of pm
+        self.updateConvergence(self.bitEntropy(self.popBits[newPop]))
+        return (self.pop[newPop])
 
     def crossOver(self):
-        cxScore = []
-        for ii in range(len(self.pop)):
-            cxScore.append([ii, random.random()])
-        cxScore.sort(key=operator.itemgetter(1))
-        cxChosen = 0
-        cxFlip = 0
-        for ii, score in cxScore:
-            if score < self.pcx:
-                if cxFlip == 1:
-                    self.pop.extend(
-                        self.crossChromosomes(
-                            self.pop[cxChosen],
-                            self.pop[ii]))
-                    cxFlip = 0
-                else:
-                    cxChosen = ii
-                    cxFlip = 1
-            else:
-                if cxFlip == 1:
-                    if random.random() < 0.5:
-                        self.pop.extend(
-                            self.crossChromosomes(
-                                self.pop[cxChosen],
-                                self.pop[ii]))
-                break
+        n = len(self.pop)
+        score = np.random.random(n)
+        order = np.argsort(score)
+        # chromosomes scoring under pcx are paired in score order, an odd one out is paired with the next one
+        # half of the time
+        chosen = order[score[order] < self.pcx]
+        if len(chosen) % 2 == 1 and len(chosen) < n and random.random() < 0.5:
+            chosen = order[:len(chosen) + 1]
+        pairs = chosen[:len(chosen) // 2 * 2].reshape(-1, 2)
+        if len(pairs):
+            c01, c10 = self.crossChromosomes(self.pop[pairs[:, 0]], self.pop[pairs[:, 1]])
+            self.pop = np.vstack([self.pop, c01, c10])
 
     def crossChromosomes(self, c0, c1):
-        pos = int(1 + random.random() * (len(c0) - 2))
-        c01 = c0[:pos] + c1[pos:]
-        c10 = c1[:pos] + c0[pos:]
+        """single point crossover of every row of c0 with the same row of c1, as a mask blend"""
+        pos = (1 + np.random.random((len(c0), 1)) * (self.candidateBitSize - 2)).astype(int)
+        m = self.pack(np.arange(self.candidateBitSize) < pos)
+        c01 = (c0 & m) | (c1 & ~m)
+        c10 = (c1 & m) | (c0 & ~m)
         return (c01, c10)
 
     def mutation(self):
-        for c in self.pop:
-            self.mutateChromsome(c)
+        self.pop ^= self.mutationMask(len(self.pop))
 
-    def mutateChromsome(self, c):
-        for ii, _ in enumerate(c):
-            if random.random() < self.pm:
-                c[ii] = 1 - c[ii]
+    def mutationMask(self, n):
+        """packed mask for n chromosomes, every bit is set independently with probability pm
+        the gaps between set bits are geometric, so only the ~ n * candidateBitSize * pm flipped bits are drawn,
+        not every bit; above skipSamplingPm a plain Bernoulli draw per bit is cheaper"""
+        total = n * self.candidateBitSize
+        if self.pm <= 0 or total == 0:
+            return np.zeros((n, self.popBytes), dtype=np.uint8)
+        if self.pm >= self.skipSamplingPm:
+            return self.pack(np.random.random((n, self.candidateBitSize)) < self.pm)
+        expected = total * self.pm
+        gaps = np.random.geometric(self.pm, int(expected + 4 * math.sqrt(expected)) + 16)
+        pos = np.cumsum(gaps) - 1
+        while pos[-1] < total:  # rare, the draw above has 4 standard deviations of headroom
+            more = np.cumsum(np.random.geometric(self.pm, len(gaps))) + pos[-1]
+            pos = np.concatenate([pos, more])
+        pos = pos[:np.searchsorted(pos, total)]
+        row, col = np.divmod(pos, self.candidateBitSize)
+        mask = np.zeros((n, self.popBytes), dtype=np.uint8)
+        np.bitwise_or.at(mask, (row, col >> 3), (0x80 >> (col & 7)).astype(np.uint8))
+        return mask
 
     def generatePop(self):
-        pop = []
-        for ii in range(self.popSize):
-            pop.append(self.generateCandidate())
+        pop = np.random.randint(0, 256, (self.popSize, self.popBytes), dtype=np.uint8)
+        pad = self.popBytes * 8 - self.candidateBitSize
+        pop[:, -1] &= (0xFF << pad) & 0xFF
         return (pop)
@@ -2,6 +2,8 @@ from src.algorithms.ga import AlgorithmGa
 
 
 class AlgorithmGaBihc(AlgorithmGa):
+    phases = AlgorithmGa.phases + ['bootstrapBihc', 'getBestMut', 'decode', 'evalMove']
+
     def getName(self):
         return ('Genetic Algorithm boostrapped with post-BIHC (Binary), popSize = ' +
                 str(self.popSize) +
@@ -10,11 +12,13 @@ class AlgorithmGaBihc(AlgorithmGa):
                 ' pcx = ' +
                 str(self.pcx) +
                 ' selPressureExponent = ' +
-                str(self.selPressure))
+                str(self.selPressure) +
+                self.getSelName())
 
     def solveStep(self):
-        if self.genCurr >= self.repeats:
-            if self.br > self.genCurr - self.genGrace:
+        stagnant = self.isStagnant()
+        if self.genCurr >= self.repeats or stagnant:
+            if not stagnant and self.br > self.genCurr - self.genGrace:
                 self.repeats += self.genGrace
             else:
                 if self.bootstrapBihc():
@@ -42,18 +46,23 @@ class AlgorithmGaBihc(AlgorithmGa):
         improved = True
         # we're in the post-generational phase
         self.genCurr += 1
+        c = self.unpack(self.pop[ii]).tolist()
+        state = None
+        if self.funcInc is not None:
+            state = self.funcInc.init(self.decode(c))
         while improved:
             improved = False
-            te, tp, tv = self.getBestMut(self.pop[ii])
+            te, tp, tv = self.getBestMut(c, state, self.popE[ii])
             if self.cmp(te, self.popE[ii]):
                 improved = True
-                self.pop[ii][tp] = 1 - self.pop[ii][tp]
+                self.applyMut(c, state, tp, tv)
                 self.popE[ii] = te
                 self.popV[ii] = tv
+        self.pop[ii] = self.pack(c)
         if self.cmp(self.popE[ii], self.be):
-            self.be = self.popE[ii]
-            self.bb = self.pop[ii][:]
-            self.bv = self.popV[ii]
+            self.be = float(self.popE[ii])
+            self.bb = c
+            self.bv = self.popV[ii].tolist()
             self.br = self.genCurr
         self.bootstrapIdx += 1
         return (True)
@@ -0,0 +1,163 @@
+import itertools
+
+import numpy as np
+
+from src.algorithms.algorithm import Algorithm
+from src.algorithms.simplex import simplex
+
+
+class AlgorithmLp(Algorithm):
+    phases = ['solvePiece', 'evalBatch']
+
+    # lfp(dimensions) returns the objective as a list of linear-fractional pieces (p, p0, q, q0, G, h, E, f) over
+    # z = [weights, aux], aux >= 0:
+    #   optimise (p @ z + p0) / (q @ z + q0), with q @ z + q0 > 0
+    #   subject to G @ z <= h, E @ z == f, lo <= weights <= hi (and sum(weights) == budget)
+    # [lo, hi] is dimRange, or [0, budget] when a budget is set: then the feasible set is the simplex
+    # {weights >= 0, sum(weights) == budget} every other algorithm searches, the dimRange box doesn't apply
+    # each piece is solved exactly with the Charnes-Cooper transform y = t * z, t = 1 / (q @ z + q0):
+    #   optimise p @ y + p0 * t
+    #   subject to G @ y <= h * t, E @ y == f * t, q @ y + q0 * t == 1, lo * t <= y_weights <= hi * t, t >= 0
+    # and the best piece is evaluated with func, like any other candidate
+    # auxiliary variables only bound the denominator from below (e.g. the downside deviations of omegaLfp), so
+    # when the numerator can't get the sign the optimisation wants (every mean below L) the transform drifts off to
+    # t = 0 by inflating them. That ratio (linear over convex) then has its optimum at a vertex of the weights'
+    # feasible set, which is scanned instead: the budget simplex, or the dimRange box corners in few dimensions
+    # status holds the simplex status of each piece, 'vertices' for a scanned one; a solution off the budget or
+    # the bounds is dropped as 'invalid', a transform with t = 0 and no auxiliary variables as 'degenerate'
+    def __init__(
+            self,
+            func,
+            lfp,
+            optimumIsMinimum=False,
+            dimensions=2,
+            steps=1,
+            budget=None,
+            doForever=0):
+        super().__init__(func, optimumIsMinimum, 0, dimensions, steps, doForever, budget=budget)
+        self.lfp = lfp
+        self.status = []  # simplex status for each piece of the last solve
+
+    def getName(self):
+        return ('Linear-Fractional Programming (Charnes-Cooper, exact), budget = ' + str(self.budget))
+
+    def restart(self):
+        self.be = self.optInit  # best eval
+        self.bb = None  # bitstring
+        self.bv = []  # values
+        self.bstep = 0  # at which eval did we achieve this best
+        self.br = 0  # repeat when best was found
+        self.exploredPoints.reset()
+        self.evals = 0
+        self.restarts += 1
+        self.repCurr = 0
+        self.status = []
+
+    def solveStep(self):
+        if self.repCurr >= self.repeats:
+            if self.doForever:
+                self.restart()
+            else:
+                return ()
+        self.repCurr += 1
+        self.status = []
+        candidates = []
+        for piece in self.lfp(self.dimensions):
+            candidates += self.solvePiece(*piece)
+        if not candidates:
+            return
+        es = self.evalBatch(candidates)
+        for e, w in zip(es.tolist(), candidates):
+            if self.cmp(e, self.be):
+                self.be = e
+                self.bv = w
+                self.bstep = self.evals
+                self.br = self.repCurr
+
+    def solve(self):
+        """solves to completion and returns the best weights, e.g. to seed AlgorithmPso"""
+        while self.repCurr < self.repeats:
+            self.solveStep()
+        return self.bv
+
+    def checkVertices(self, rtol=1e-6):
+        """(best vertex eval, its weights, ok) over the vertices of every piece's feasible set within the budget
+        simplex, found by enumeration; ok: the last solve is at least as good. The optimum of a linear-fractional
+        piece is at one of these vertices, so this checks the LP; only for a budget and pieces without auxiliary
+        variables (e.g. Functions.omegaLfp), in few dimensions"""
+        if self.budget is None:
+            raise ValueError('checkVertices needs a budget')
+        n = self.dimensions
+        be, bv = self.optInit, []
+        for p, p0, q, q0, G, h, E, f in self.lfp(n):
+            if len(p) != n:
+                raise ValueError('checkVertices only works for pieces without auxiliary variables')
+            aEq = np.vstack([np.ones((1, n)), E])
+            bEq = np.concatenate([[self.budget], f])
+            aUb = np.vstack([-np.eye(n), G])
+            bUb = np.concatenate([np.zeros(n), h])
+            for active in itertools.combinations(range(len(aUb)), n - len(aEq)):
+                a = np.vstack([aEq, aUb[list(active)]])
+                if abs(np.linalg.det(a)) < 1e-12:
+                    continue
+                w = np.linalg.solve(a, np.concatenate([bEq, bUb[list(active)]]))
+                tol = 1e-9 * max(1, self.budget)
+                if (aUb @ w > bUb + tol).any() or q @ w + q0 <= 0:
+                    continue
+                e = self.func(w.tolist())
+                if self.cmp(e, be):
+                    be, bv = e, w.tolist()
+        ok = not self.cmp(be, self.be) or abs(be - self.be) <= rtol * max(1, abs(be))
+        return be, bv, bool(ok)
+
+    def solvePiece(self, p, p0, q, q0, G, h, E, f):
+        n = self.dimensions
+        nz = len(p)
+        lo, hi = self.dimRange if self.budget is None else (0, self.budget)
+        # rows over [y, t]
+        eq = [np.hstack([E, -np.asarray(f, dtype=np.float64)[:, None]]),
+              np.append(q, q0)[None, :]]
+        beq = [np.zeros(len(E)), [1]]
+        if self.budget is not None:
+            eq.append(np.concatenate([np.ones(n), np.zeros(nz - n), [-self.budget]])[None, :])
+            beq.append([0])
+        ub = [np.hstack([G, -np.asarray(h, dtype=np.float64)[:, None]]),
+              np.hstack([np.eye(n), np.zeros((n, nz - n)), np.full((n, 1), -hi)])]
+        # the simplex wants x >= 0, so the weights are shifted: y_weights = s + lo * t, s >= 0
+        M = np.eye(nz + 1)
+        M[:n, -1] = lo
+        aEq = np.vstack(eq) @ M
+        aUb = np.vstack(ub) @ M
+        c = -np.append(p, p0) @ M
+        if self.optimumIsMinimum:
+            c = -c
+        x, status = simplex(c, aUb, np.zeros(len(aUb)), aEq, np.concatenate(beq))
+        if x is None:
+            self.status.append(status)
+            return []
+        y = M @ x
+        if y[-1] <= 1e-12 * max(1, np.abs(y).max()):
+            if nz == n:
+                self.status.append('degenerate')
+                return []
+            return self.vertices(lo, hi)
+        w = y[:n] / y[-1]
+        tol = 1e-7 * max(1, abs(lo), abs(hi))
+        if (w < lo - tol).any() or (w > hi + tol).any() or (
+                self.budget is not None and abs(w.sum() - self.budget) > tol * n):
+            self.status.append('invalid')
+            return []
+        self.status.append(status)
+        return [np.clip(w, lo, hi).tolist()]
+
+    def vertices(self, lo, hi, maxDimensions=16):
+        """the vertices of the weights' feasible set, for a piece the transform can't solve"""
+        n = self.dimensions
+        if self.budget is not None:
+            self.status.append('vertices')
+            return (self.budget * np.eye(n)).tolist()
+        if n > maxDimensions:
+            self.status.append('degenerate')
+            return []
+        self.status.append('vertices')
+        return [list(v) for v in itertools.product([lo, hi], repeat=n)]
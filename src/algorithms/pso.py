@@ -1,14 +1,24 @@
 import math
-import random
+
+import numpy as np
 
 from src.algorithms.algorithm import Algorithm
+from src.algorithms.bounds import boundaries, clampBoundary, simplexBoundary
 
 
 class AlgorithmPso(Algorithm):
+    phases = ['generatePop', 'evalPop', 'updatePop', 'simPop', 'evalBatch']
+
     # w = [intertia, cognitive, social, inertiaMulPerGeneration, speedMul, randAccel]
     # speedProportion:
     # if each dimension is given by the interval [a, b]
     # v = random(-1, 1) * (b - a) * speedMul
+    # budget: if set, the search is restricted to fully invested, long-only portfolios {w >= 0, sum(w) = budget}
+    # boundary: handler(pos, vel, dimRange, budget) applied after every move, see src.algorithms.bounds;
+    # a name from bounds.boundaries or a function, defaults to 'clamp', or 'simplex' when a budget is set
+    # diversity: the larger of the RMS distance of the particles to their centroid and their RMS speed, both relative
+    # to the dimension interval length; under minDiversity the swarm has collapsed, with convergenceStop the run then
+    # ends (or restarts) right away instead of waiting out gen_grace
     def __init__(self,
                  func,
                  minimize=False,
@@ -18,8 +28,19 @@ class AlgorithmPso(Algorithm):
                  gen_no=1000,
                  gen_grace=200,
                  w=None,
-                 do_forever=0):
-        super().__init__(func, minimize, 0, dimensions, steps, do_forever)
+                 do_forever=0,
+                 budget=None,
+                 boundary=None,
+                 min_diversity=0.001,
+                 convergence_stop=False):
+        super().__init__(func, minimize, 0, dimensions, steps, do_forever, budget=budget)
+        if boundary is None:
+            boundary = clampBoundary if budget is None else simplexBoundary
+        elif isinstance(boundary, str):
+            boundary = boundaries[boundary]
+        self.boundary = boundary
+        self.minDiversity = min_diversity
+        self.convergenceStop = convergence_stop
         if w is None:
             w = [1,
                  2,
@@ -34,16 +55,19 @@ class AlgorithmPso(Algorithm):
         self.repeats = self.genNo
         self.genGrace = gen_grace
         self.genCurr = self.repCurr = 0
+        # the swarm is kept in (pop_size, dimensions) float64 arrays and updated as a whole
         self.pop = None
         self.popV = None  # population speed
         # population past (best previous value for that particle)
         self.popP = None
-        self.popE = None  # population evaluated values: f(X)
+        self.popE = None  # population evaluated values: f(X), (pop_size,)
         self.popPE = None  # population past evaluated values
         self.genMin = math.inf
         self.genMax = -math.inf
         self.g = self.optInit
         self.gp = None
+        self.seedPoints = None
+        self.seedSpread = 0
 
     def getName(self):
         return ('Particle Swarm Optimisation Algorithm (Floating-point), popSize = ' +
@@ -61,13 +85,16 @@ class AlgorithmPso(Algorithm):
         self.bv = []  # values
         self.bstep = 0  # at which eval did we achieve this best
         self.br = 0  # repeat when best was found
-        self.exploredPoints = []
+        self.exploredPoints.reset()
+        self.resetConvergence()
         self.evals = 0
+        self.restarts += 1
         self.repCurr = 0
 
     def solveStep(self):
-        if self.genCurr >= self.repeats:
-            if self.br > self.genCurr - self.genGrace:
+        stagnant = self.convergenceStop and self.convergedAt is not None
+        if self.genCurr >= self.repeats or stagnant:
+            if not stagnant and self.br > self.genCurr - self.genGrace:
                 self.repeats += self.genGrace
             elif self.doForever == 1:
                 self.restart()
@@ -78,106 +105,80 @@ class AlgorithmPso(Algorithm):
         if self.pop is None or len(self.pop) == 0:
             self.pop, self.popV = self.generatePop()
             self.evalPop()
-            self.popP = self.pop[:]
-            self.popPE = self.popE[:]
+            self.popP = self.pop.copy()
+            self.popPE = self.popE.copy()
         self.evalPop()
         self.updatePop()
         self.simPop()
 
     def updatePop(self):
-        for ii in range(len(self.popE)):
-            if self.cmp(self.popE[ii], self.popPE[ii]):
-                self.popP[ii] = self.pop[ii][:]
-                self.popPE[ii] = self.popE[ii]
+        better = self.cmp(self.popE, self.popPE)
+        self.popP[better] = self.pop[better]
+        self.popPE[better] = self.popE[better]
 
     def simPop(self):
-        for ii in range(len(self.pop)):
-            inertia = self.mul(self.popV[ii], self.w[0])
-            pastDiff = self.diff(self.popP[ii], self.pop[ii])
-            cognition = self.mul(pastDiff, self.w[1] * random.random())
-            greatestDiff = self.diff(self.gp, self.pop[ii])
-            social = self.mul(greatestDiff, self.w[2] * random.random())
-            randSpeed = self.mul(self.genRandSpeed(), self.w[5] * self.w[0])
-            self.popV[ii] = self.sum(inertia, cognition, social, randSpeed)
-        for ii in range(len(self.pop)):
-            p = self.sum(self.pop[ii], self.popV[ii])
-            for jj, pv in enumerate(p):
-                if pv < self.dimRange[0]:
-                    p[jj] = self.dimRange[0]
-                    self.popV[ii][jj] = 0
-                if pv > self.dimRange[1]:
-                    p[jj] = self.dimRange[1]
-                    self.popV[ii][jj] = 0
-            self.pop[ii] = p
-
+        n = len(self.pop)
+        # one cognitive and one social coefficient per particle, like the per particle scalar update
+        r = np.random.random((n, 2))
+        vel = (self.popV * self.w[0]
+               + (self.popP - self.pop) * (self.w[1] * r[:, :1])
+               + (self.gp - self.pop) * (self.w[2] * r[:, 1:])
+               + self.genRandSpeed(n) * (self.w[5] * self.w[0]))
+        self.pop, self.popV = self.boundary(self.pop + vel, vel, self.dimRange, self.budget)
         self.w[0] *= self.w[3]
+        # once per generation, for the swarm the next evalPop evaluates; the initial swarm is evaluated twice
+        self.updateConvergence(self.swarmDiversity())
+
+    def searchLength(self):
+        """the extent of a dimension of the search space: the budget on the simplex, else the dimRange interval"""
+        return self.dimIntervalLength if self.budget is None else self.budget
+
+    def genRandSpeed(self, n):
+        return self.w[4] * self.searchLength() * (np.random.random((n, self.dimensions)) * 2 - 1)
 
-    def genRandSpeed(self):
-        s = []
-        for _ in range(self.dimensions):
-            s.append(self.w[4] * self.dimIntervalLength *
-                     (random.random() * 2 - 1))
-        return (s)
-
-    def sum(self, *args):
-        '''vector sum'''
-        r = []
-        for v in zip(*args):
-            r.append(sum(v))
-        return (r)
-
-    def diff(self, v0, v1):
-        '''vector difference, v0 - v1'''
-        r = []
-        for ii, jj in zip(v0, v1):
-            r.append(ii - jj)
-        return (r)
-
-    def mul(self, v, s):
-        '''vector * scalar'''
-        r = []
-        for ii in v:
-            r.append(ii * s)
-        return (r)
+    def seed(self, points, spread=0.05):
+        """starts every following swarm around points (e.g. [AlgorithmLp.solve()]) instead of at random
+        the first particles sit exactly on the points, the others are scattered around them with a standard
+        deviation of spread * searchLength()"""
+        self.seedPoints = np.array(points, dtype=np.float64).reshape(-1, self.dimensions)
+        self.seedSpread = spread
 
     def generatePop(self):
-        pop = []
-        popV = []
-        for ii in range(self.popSize):
-            p = []
-            v = []
-            for jj in range(self.dimensions):
-                pd = self.dimRange[0] + self.dimIntervalLength * \
-                    (random.random() * 2 - 1)
-                vd = self.w[4] * self.dimIntervalLength * \
-                    (random.random() * 2 - 1)
-                p.append(pd)
-                v.append(vd)
-            pop.append(p)
-            popV.append(v)
+        n = self.popSize
+        if self.seedPoints is not None and len(self.seedPoints):
+            k = len(self.seedPoints)
+            pop = self.seedPoints[np.arange(n) % k]
+            pop[k:] += np.random.normal(0, self.seedSpread * self.searchLength(), (max(0, n - k), self.dimensions))
+            if self.budget is None:
+                # on the simplex the projection below makes them feasible, dimRange doesn't apply
+                pop = np.clip(pop, self.dimRange[0], self.dimRange[1])
+        else:
+            pop = self.dimRange[0] + self.dimIntervalLength * (np.random.random((n, self.dimensions)) * 2 - 1)
+        popV = self.genRandSpeed(n)
+        if self.budget is not None:
+            # the first evaluation happens before any move, so the initial swarm has to be feasible already
+            pop = self.boundary(pop, popV, self.dimRange, self.budget)[0]
         return pop, popV
 
     def decode(self, p):
         return p
 
+    def swarmDiversity(self):
+        scale = self.searchLength() * math.sqrt(self.dimensions)
+        radius = math.sqrt(((self.pop - self.pop.mean(axis=0)) ** 2).sum(axis=1).mean())
+        speed = math.sqrt((self.popV ** 2).sum(axis=1).mean())
+        return max(radius, speed) / scale
+
     def evalPop(self):
-        self.g = self.optInit
-        self.popE = []
-        self.genMin = math.inf
-        self.genMax = -math.inf
-        for p in self.pop:
-            e = self.eval(p)
-            if e < self.genMin:
-                self.genMin = e
-            if e > self.genMax:
-                self.genMax = e
-            if self.cmp(e, self.g):
-                self.g = e
-                self.gp = p[:]
-            if self.cmp(e, self.be):
-                self.be = e
-                self.bb = None
-                self.bv = p[:]
-                self.bstep = self.evals
-                self.br = self.genCurr
-            self.popE.append(e)
+        self.popE = self.evalBatch(self.pop)
+        self.genMin = float(self.popE.min())
+        self.genMax = float(self.popE.max())
+        ib = self.getOptIdx(self.popE)
+        self.g = float(self.popE[ib])
+        self.gp = self.pop[ib].copy()
+        if self.cmp(self.g, self.be):
+            self.be = self.g
+            self.bb = None
+            self.bv = self.gp.tolist()
+            self.bstep = self.evals - len(self.popE) + ib + 1
+            self.br = self.genCurr
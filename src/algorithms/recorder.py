@@ -0,0 +1,123 @@
+import math
+
+import numpy as np
+
+# what PointRecorder.record keeps of the points it is offered
+recordingModes = ['full', 'nth', 'improvements', 'off']
+
+
+class PointRecorder:
+    """bounded store of the explored points, for the visualisation
+
+    the points are rows [e, *values] of a preallocated (capacity, 1 + dimensions) float64 ring buffer, allocated on
+    the first point kept; once full, the oldest rows are overwritten. mode:
+    full: every point, nth: every `every`-th point offered, improvements: only points better than every point
+    offered before them (since reset()), off: nothing, only the counters run"""
+
+    def __init__(self, dimensions, mode='full', every=1, capacity=1 << 16, optimumIsMinimum=True):
+        if mode not in recordingModes:
+            raise ValueError('unknown recording mode ' + str(mode) + ', one of ' + str(recordingModes))
+        self.dimensions = dimensions
+        self.mode = mode
+        self.every = max(1, int(every))
+        self.capacity = capacity
+        self.optimumIsMinimum = optimumIsMinimum
+        self.buf = None
+        self.head = 0  # next row to write
+        self.stored = 0  # rows kept since clear(), at most capacity
+        self.offered = 0  # points offered since clear()
+        self.total = 0  # points offered, ever
+        self.best = math.inf if optimumIsMinimum else -math.inf
+
+    def __len__(self):
+        return self.stored
+
+    def clear(self):
+        """drops the stored points"""
+        self.head = 0
+        self.stored = 0
+        self.offered = 0
+
+    def reset(self):
+        """drops the stored points and forgets the best, for a restart"""
+        self.clear()
+        self.best = math.inf if self.optimumIsMinimum else -math.inf
+
+    def record(self, es, values):
+        """offers a batch of points, es is (n,), values (n, dimensions)"""
+        n = len(es)
+        first = self.total
+        self.total += n
+        self.offered += n
+        if self.mode == 'off' or n == 0:
+            return
+        if self.mode == 'full':
+            self.write(es, values)
+            return
+        es = np.asarray(es, dtype=np.float64)
+        if self.mode == 'nth':
+            keep = (np.arange(first, first + n) % self.every) == 0
+        else:
+            if self.optimumIsMinimum:
+                before = np.minimum.accumulate(np.concatenate([[self.best], es[:-1]]))
+                keep = es < before
+                self.best = min(self.best, float(es.min()))
+            else:
+                before = np.maximum.accumulate(np.concatenate([[self.best], es[:-1]]))
+                keep = es > before
+                self.best = max(self.best, float(es.max()))
+        if keep.any():
+            self.write(es[keep], np.asarray(values, dtype=np.float64)[keep])
+
+    def recordOne(self, e, values):
+        """offers a single point, same as record() without the array overhead"""
+        index = self.total
+        self.total += 1
+        self.offered += 1
+        if self.mode == 'off':
+            return
+        if self.mode == 'nth' and index % self.every:
+            return
+        if self.mode == 'improvements':
+            if not (e < self.best if self.optimumIsMinimum else e > self.best):
+                return
+            self.best = e
+        if self.buf is None:
+            self.buf = np.empty((self.capacity, 1 + self.dimensions), dtype=np.float64)
+        row = self.buf[self.head]
+        row[0] = e
+        row[1:] = values
+        self.head = (self.head + 1) % self.capacity
+        if self.stored < self.capacity:
+            self.stored += 1
+
+    def write(self, es, values):
+        if self.buf is None:
+            self.buf = np.empty((self.capacity, 1 + self.dimensions), dtype=np.float64)
+        n = len(es)
+        if n > self.capacity:  # only the newest capacity rows survive anyway
+            es = es[n - self.capacity:]
+            values = values[n - self.capacity:]
+            n = self.capacity
+        end = self.head + n
+        if end <= self.capacity:
+            self.buf[self.head:end, 0] = es
+            self.buf[self.head:end, 1:] = values
+        else:
+            k = self.capacity - self.head
+            self.buf[self.head:, 0] = es[:k]
+            self.buf[self.head:, 1:] = values[:k]
+            self.buf[:n - k, 0] = es[k:]
+            self.buf[:n - k, 1:] = values[k:]
+        self.head = end % self.capacity
+        self.stored = min(self.capacity, self.stored + n)
+
+    def points(self):
+        """the stored points, oldest first, as a (stored, 1 + dimensions) array; a view of the buffer (no copy)
+        unless the ring has wrapped around since clear()"""
+        if self.stored == 0:
+            return np.empty((0, 1 + self.dimensions), dtype=np.float64)
+        start = self.head - self.stored
+        if start >= 0:
+            return self.buf[start:self.head]
+        return np.concatenate([self.buf[start:], self.buf[:self.head]])
@@ -0,0 +1,56 @@
+import numpy as np
+
+
+# selection operators for AlgorithmGa
+# operator(popE, n, optimumIsMinimum, selPressure) -> (n,) indexes into the population, popE is the (pop size,)
+# array of evaluated values; every operator is O(pop size log pop size) or better and draws all its randoms at once
+
+
+def drawProportional(weights, n):
+    """n indexes drawn with probability proportional to weights: cumulative sums + binary search"""
+    partialSums = np.cumsum(weights)
+    idx = np.searchsorted(partialSums, np.random.random(n) * partialSums[-1], side='right')
+    return np.minimum(idx, len(weights) - 1)  # guards against float round off at the top end
+
+
+def rouletteSelection(popE, n, optimumIsMinimum=True, selPressure=1):
+    """fitness proportional, fitness = ((distance to the worst + epsilon) / (half the eval range)) ** selPressure"""
+    genMin = popE.min()
+    genMax = popE.max()
+    evalDistance = genMax - genMin
+    if evalDistance == 0:
+        evalDistance = 1
+    epsilon = evalDistance * 0.01
+    div = evalDistance / 2
+    if optimumIsMinimum:
+        f = (genMax - popE + epsilon) / div
+    else:
+        f = (popE - genMin + epsilon) / div
+    return drawProportional(np.power(f, selPressure), n)
+
+
+def rankSelection(popE, n, optimumIsMinimum=True, selPressure=1):
+    """proportional to rank ** selPressure, the worst has rank 1 and the best rank pop size
+    unlike the roulette it does not care how far apart the evals are, only about their order"""
+    order = np.argsort(popE, kind='stable')
+    if optimumIsMinimum:
+        order = order[::-1]
+    rank = np.empty(len(popE))
+    rank[order] = np.arange(1, len(popE) + 1)
+    return drawProportional(np.power(rank, selPressure), n)
+
+
+def tournamentSelection(popE, n, optimumIsMinimum=True, selPressure=2):
+    """the best of round(selPressure) (at least 2) uniformly drawn contestants, n tournaments at once"""
+    size = max(2, int(round(selPressure)))
+    contestants = np.random.randint(0, len(popE), (n, size))
+    e = popE[contestants]
+    winner = e.argmin(axis=1) if optimumIsMinimum else e.argmax(axis=1)
+    return contestants[np.arange(n), winner]
+
+
+selections = {
+    'roulette': rouletteSelection,
+    'rank': rankSelection,
+    'tournament': tournamentSelection,
+}
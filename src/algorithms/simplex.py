@@ -0,0 +1,113 @@
+import numpy as np
+
+
+def simplex(c, aUb=None, bUb=None, aEq=None, bEq=None, maxIter=None, tol=1e-9):
+    """minimises c @ x subject to aUb @ x <= bUb, aEq @ x == bEq, x >= 0
+    dense two-phase tableau simplex, Dantzig's rule with a switch to Bland's rule while stalling
+    returns (x, status), status is one of 'optimal', 'infeasible', 'unbounded', 'maxIter'; x is None unless
+    optimal"""
+    c = np.asarray(c, dtype=np.float64)
+    n = len(c)
+    aUb = np.zeros((0, n)) if aUb is None else np.asarray(aUb, dtype=np.float64).reshape(-1, n)
+    aEq = np.zeros((0, n)) if aEq is None else np.asarray(aEq, dtype=np.float64).reshape(-1, n)
+    bUb = np.zeros(0) if bUb is None else np.asarray(bUb, dtype=np.float64).reshape(-1)
+    bEq = np.zeros(0) if bEq is None else np.asarray(bEq, dtype=np.float64).reshape(-1)
+    mUb, mEq = len(aUb), len(aEq)
+    m = mUb + mEq
+    ns = n + mUb  # structural + slack columns
+    if maxIter is None:
+        maxIter = 50 * (m + ns) + 1000
+
+    # standard form: [aUb I; aEq 0] @ [x; s] = b, with b >= 0
+    b = np.concatenate([bUb, bEq])
+    neg = b < 0
+    basis = np.full(m, -1)
+    rowsUb = np.arange(mUb)
+    free = rowsUb[~neg[:mUb]]
+    basis[free] = n + free  # rows keeping a +1 slack start with it in the basis
+    art = np.flatnonzero(basis < 0)
+    nArt = len(art)
+    t = np.zeros((m + 1, ns + nArt + 1))
+    t[:mUb, :n] = aUb
+    t[rowsUb, n + rowsUb] = 1
+    t[mUb:m, :n] = aEq
+    t[:m, -1] = b
+    t[:m][neg] *= -1
+    t[art, ns + np.arange(nArt)] = 1
+    basis[art] = ns + np.arange(nArt)
+
+    # phase 1: minimise the sum of the artificials
+    # the last row holds the reduced costs, t[-1, -1] is minus the objective value
+    if nArt:
+        t[-1] = -t[art].sum(axis=0)
+        t[-1, ns:-1] = 0
+        status = _iterate(t, basis, ns + nArt, maxIter, tol)
+        if status != 'optimal':
+            return None, status
+        if -t[-1, -1] > tol * max(1.0, np.abs(b).max()):
+            return None, 'infeasible'
+        # drive the remaining (zero valued) artificials out of the basis, drop redundant rows
+        keep = np.ones(m + 1, dtype=bool)
+        for r in np.flatnonzero(basis >= ns):
+            cols = np.flatnonzero(np.abs(t[r, :ns]) > tol)
+            if len(cols):
+                _pivot(t, basis, r, cols[0])
+            else:
+                keep[r] = False
+        t = t[keep]
+        basis = basis[keep[:-1]]
+        t = np.delete(t, np.s_[ns:ns + nArt], axis=1)
+
+    # phase 2: the actual costs
+    cost = np.zeros(ns)
+    cost[:n] = c
+    t[-1] = 0
+    t[-1, :ns] = cost
+    t[-1] -= cost[basis] @ t[:-1]
+    status = _iterate(t, basis, ns, maxIter, tol)
+    if status != 'optimal':
+        return None, status
+    x = np.zeros(ns)
+    x[basis] = t[:-1, -1]
+    return x[:n], status
+
+
+def _pivot(t, basis, r, c):
+    t[r] /= t[r, c]
+    col = t[:, c].copy()
+    col[r] = 0
+    t -= np.outer(col, t[r])
+    basis[r] = c
+
+
+def _iterate(t, basis, cols, maxIter, tol):
+    """runs simplex pivots on tableau t, only the first cols columns may enter the basis"""
+    stalled = 0
+    for _ in range(maxIter):
+        rc = t[-1, :cols]
+        if stalled > 10:
+            # Bland's rule: lowest index entering and leaving, guarantees termination on degenerate vertices
+            candidates = np.flatnonzero(rc < -tol)
+            if len(candidates) == 0:
+                return 'optimal'
+            c = candidates[0]
+        else:
+            c = int(np.argmin(rc))
+            if rc[c] >= -tol:
+                return 'optimal'
+        col = t[:-1, c]
+        pos = col > tol
+        if not pos.any():
+            return 'unbounded'
+        ratios = np.full(len(col), np.inf)
+        ratios[pos] = t[:-1, -1][pos] / col[pos]
+        best = ratios.min()
+        ties = np.flatnonzero(ratios <= best + tol)
+        if stalled > 10:
+            r = ties[np.argmin(basis[ties])]
+        else:
+            # the largest pivot among the ties keeps the tableau well conditioned
+            r = ties[np.argmax(col[ties])]
+        stalled = stalled + 1 if best <= tol else 0
+        _pivot(t, basis, r, c)
+    return 'maxIter'
@@ -1,6 +1,8 @@
 import math
 from enum import IntEnum
 
+import numpy as np
+
 
 class Functions:
     zeroDimRange = [-1, 1]
@@ -26,4 +28,57 @@ class Functions:
 
         return (wESum - Functions.L) / (abs(Functions.L - wSum) + 0.0000001)
 
+    @staticmethod
+    def omegaBatch(weights):
+        """Omega-optimized portfolio, one value for each row of a (pop_size, dimensions) weight matrix"""
+        weights = np.asarray(weights, dtype=np.float64)
+        n = weights.shape[1]
+        wESum = weights @ np.asarray(Functions.expectedReturns[:n], dtype=np.float64)
+        wSum = weights @ np.asarray(Functions.currentReturns[:n], dtype=np.float64)
+        return (wESum - Functions.L) / (np.abs(Functions.L - wSum) + 0.0000001)
+
+    class OmegaIncremental:
+        """running sums for omega; a single changed weight is re-evaluated in O(1)
+
+        state = [sum(w * expectedReturns), sum(w * currentReturns), weights]"""
+
+        evalSize = 1
+
+        @staticmethod
+        def init(values):
+            return [sum(w * r for w, r in zip(values, Functions.expectedReturns)),
+                    sum(w * r for w, r in zip(values, Functions.currentReturns)),
+                    list(values)]
+
+        @staticmethod
+        def eval(state, dim, value):
+            """omega after setting weights[dim] = value, the state is left unchanged"""
+            d = value - state[2][dim]
+            wESum = state[0] + d * Functions.expectedReturns[dim]
+            wSum = state[1] + d * Functions.currentReturns[dim]
+            return (wESum - Functions.L) / (abs(Functions.L - wSum) + 0.0000001)
+
+        @staticmethod
+        def apply(state, dim, value):
+            d = value - state[2][dim]
+            state[0] += d * Functions.expectedReturns[dim]
+            state[1] += d * Functions.currentReturns[dim]
+            state[2][dim] = value
+
+    @staticmethod
+    def omegaLfp(dimensions):
+        """omega as linear-fractional pieces (p, p0, q, q0, G, h, E, f) over the weights, see AlgorithmLp
+        the |L - wSum| denominator is split by its sign into two pieces"""
+        e = np.asarray(Functions.expectedReturns[:dimensions], dtype=np.float64)
+        c = np.asarray(Functions.currentReturns[:dimensions], dtype=np.float64)
+        L = Functions.L
+        eps = 0.0000001
+        noEq = np.zeros((0, dimensions))
+        return [
+            # wSum >= L
+            (e, -L, c, eps - L, -c[None, :], np.array([-L]), noEq, np.zeros(0)),
+            # wSum <= L
+            (e, -L, -c, eps + L, c[None, :], np.array([L]), noEq, np.zeros(0)),
+        ]
+
     omegaRange = [4, 25]
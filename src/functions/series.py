@@ -0,0 +1,122 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class OmegaSeries:
+    """Omega ratio over a history of returns: E[max(r - L, 0)] / E[max(L - r, 0)]
+
+    returns is a T x N matrix (days x strategies), the portfolio return for a weight vector w is returns @ w.
+    Use functions() to get the (func, range, batch, incremental) list expected by Algorithm.
+    """
+
+    # upper bound for the number of float64 values in a T x pop_size intermediate, per batch chunk
+    chunkValues = 1 << 22
+
+    def __init__(self, returns, threshold=0.0, omegaRange=None):
+        self.returns = np.ascontiguousarray(returns, dtype=np.float64)
+        if self.returns.ndim != 2:
+            raise ValueError('returns must be a T x N matrix, got shape ' + str(self.returns.shape))
+        self.L = float(threshold)
+        if omegaRange is None:
+            omegaRange = [0, 1]
+        self.omegaRange = omegaRange
+        self.days, self.strategies = self.returns.shape
+        self.columns = None  # returns.T, contiguous per strategy; only built for incremental evaluation
+        self.shm = None  # the shared memory block holding returns, see shareMemory
+        self.shmOwner = False
+
+    def shareMemory(self):
+        """moves returns into a shared memory block, pickled copies (e.g. sent to a process pool) then attach to it
+        instead of carrying the whole matrix along; returns True if this call created the block"""
+        if self.shm is not None:
+            return False
+        shm = shared_memory.SharedMemory(create=True, size=max(1, self.returns.nbytes))
+        returns = np.ndarray(self.returns.shape, dtype=np.float64, buffer=shm.buf)
+        returns[:] = self.returns
+        self.returns = returns
+        self.shm = shm
+        self.shmOwner = True
+        return True
+
+    def releaseMemory(self):
+        """back to a private copy of returns; the block is freed by the instance which created it"""
+        if self.shm is None:
+            return
+        self.returns = self.returns.copy()
+        self.shm.close()
+        if self.shmOwner:
+            self.shm.unlink()
+        self.shm = None
+        self.shmOwner = False
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if self.shm is not None:
+            state.update(returns=None, columns=None, shm=(self.shm.name, self.returns.shape), shmOwner=False)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.shm is not None:
+            name, shape = self.shm
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.returns = np.ndarray(shape, dtype=np.float64, buffer=self.shm.buf)
+
+    def functions(self):
+        return [self.omega, self.omegaRange, self.omegaBatch, self]
+
+    def ratio(self, portfolioReturns):
+        """omega for the portfolio return series, works column-wise on a T x pop_size matrix"""
+        # E[max(r - L, 0)] - E[max(L - r, 0)] = E[r - L], so a single partial moment is enough
+        up = np.maximum(portfolioReturns - self.L, 0).sum(axis=0)
+        down = up - (portfolioReturns.sum(axis=0) - self.days * self.L)
+        return up / (down + 0.0000001)
+
+    def omega(self, weights):
+        """Omega-optimized portfolio (time series)"""
+        return float(self.ratio(self.returns @ np.asarray(weights, dtype=np.float64)))
+
+    def omegaBatch(self, weights):
+        """Omega-optimized portfolio (time series), one value for each row of a (pop_size, dimensions) matrix"""
+        weights = np.asarray(weights, dtype=np.float64)
+        chunk = max(1, self.chunkValues // max(1, self.days))
+        if len(weights) <= chunk:
+            return self.ratio(self.returns @ weights.T)
+        es = np.empty(len(weights), dtype=np.float64)
+        for ii in range(0, len(weights), chunk):
+            es[ii:ii + chunk] = self.ratio(self.returns @ weights[ii:ii + chunk].T)
+        return es
+
+    def omegaLfp(self, dimensions):
+        """omega - 1 = E[r - L] / E[max(L - r, 0)] as a linear-fractional piece (p, p0, q, q0, G, h, E, f) over
+        [weights, d], see AlgorithmLp; d >= L - returns @ w, d >= 0 are the downside deviations, one per day"""
+        T = self.days
+        p = np.concatenate([self.returns.mean(axis=0), np.zeros(T)])
+        q = np.concatenate([np.zeros(dimensions), np.full(T, 1 / T)])
+        G = np.hstack([-self.returns, -np.eye(T)])
+        h = np.full(T, -self.L)
+        return [(p, -self.L, q, 0.0000001, G, h, np.zeros((0, dimensions + T)), np.zeros(0))]
+
+    # incremental evaluation, state = [portfolio returns (T), weights]
+    # a single changed weight costs O(T) instead of the O(T * N) matrix-vector product
+
+    @property
+    def evalSize(self):
+        return self.days
+
+    def init(self, values):
+        if self.columns is None:
+            self.columns = np.ascontiguousarray(self.returns.T)
+        w = np.array(values, dtype=np.float64)
+        return [self.returns @ w, w]
+
+    def eval(self, state, dim, value):
+        """omega after setting weights[dim] = value, the state is left unchanged"""
+        d = value - state[1][dim]
+        return float(self.ratio(state[0] + d * self.columns[dim]))
+
+    def apply(self, state, dim, value):
+        d = value - state[1][dim]
+        state[0] += d * self.columns[dim]
+        state[1][dim] = value
@@ -0,0 +1,86 @@
+import copy
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src.runner import HeadlessRunner
+
+
+def run_restart(algorithm, seed, max_evals, max_time, deadline):
+    """one independent run, in a worker process; algorithm is a fresh (pickled) copy of the prototype"""
+    if deadline is not None:
+        max_time = min(max_time, deadline - time.time())
+        if max_time <= 0:
+            return None  # queued behind the others until the wall-clock budget ran out
+    random.seed(seed)
+    np.random.seed(seed)
+    runner = HeadlessRunner(algorithm, max_evals, max_time)
+    r = runner.run()
+    r['seed'] = seed
+    return r
+
+
+class MultiStart:
+    """runs restarts independent copies of an algorithm on a process pool and keeps the best of them
+
+    algorithm is the prototype, it must be picklable (so no profiling) and is not modified; every restart gets its own
+    seed for random and numpy.random. max_evals is the budget of each restart, max_time the wall-clock budget of the
+    whole multi-start; with more restarts than processes it is shared between the waves of restarts."""
+
+    def __init__(self, algorithm, restarts=None, processes=None, max_evals=None, max_time=None, seed=0):
+        self.algorithm = algorithm
+        self.processes = processes or os.cpu_count()
+        self.restarts = restarts or self.processes
+        self.max_evals = max_evals
+        self.max_time = max_time
+        self.seeds = [int(s) for s in np.random.SeedSequence(seed).generate_state(self.restarts)]
+        self.results = []
+
+    def run(self):
+        start = time.time()
+        deadline = each = None
+        if self.max_time is not None:
+            deadline = start + self.max_time
+            each = self.max_time / math.ceil(self.restarts / self.processes)
+        if self.processes == 1:
+            self.results = [run_restart(copy.deepcopy(self.algorithm), s, self.max_evals, each, deadline)
+                            for s in self.seeds]
+        else:
+            with ProcessPoolExecutor(self.processes) as pool:
+                futures = [pool.submit(run_restart, self.algorithm, s, self.max_evals, each, deadline)
+                           for s in self.seeds]
+                self.results = [f.result() for f in futures]
+        return self.merge(time.time() - start)
+
+    def merge(self, wall_time):
+        alg = self.algorithm
+        best = None
+        for ii, r in enumerate(self.results):
+            if r is None or not len(r['bv']):
+                continue
+            if best is None or alg.cmp(r['be'], self.results[best]['be']):
+                best = ii
+        done = [r for r in self.results if r is not None]
+        evals = sum(r['evals'] for r in done)
+        merged = {
+            'algorithm': str(alg),
+            'be': alg.optInit,
+            'bv': [],
+            'bstep': 0,
+            'restart': None,  # index of the restart which found the best
+            'seed': None,
+            'restarts': len(done),
+            'evals': evals,
+            'time': wall_time,
+            'evalsPerSecond': evals / wall_time if wall_time else 0,
+            'results': [None if r is None else {k: r[k] for k in ('be', 'bstep', 'evals', 'time', 'seed', 'finished')}
+                        for r in self.results],
+        }
+        if best is not None:
+            r = self.results[best]
+            merged.update(be=r['be'], bv=r['bv'], bstep=r['bstep'], restart=best, seed=r['seed'])
+        return merged
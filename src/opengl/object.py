@@ -1,15 +1,18 @@
-import math
 from collections import defaultdict
-from ctypes import c_float
 
+import numpy as np
 from OpenGL.GL import *
 from OpenGL.GLUT import *
 
 from src.const import styleDict, glConst, glFunc
 from src.types import DrawStyle, AS, A
+from src.utils import grid_mesh, grid_mesh_vertices, grid_cell_quads
 
 
 class OglObject:
+    # see vertexSpans
+    spanGap = 16
+
     def __init__(
             self,
             grid=None,
@@ -21,18 +24,21 @@ class OglObject:
             style=DrawStyle.triangles2,
             size=101,
             contrast=0,
-            optimumIsMinimum=True):
+            optimumIsMinimum=True,
+            indices=None):
         self.data = defaultdict(defaultdict)
         self.length = 0
+        # element array, drawn with glDrawElements; grid objects get theirs from utils.grid_mesh
+        self.indices = None
+        self.indicesChanged = False
+        self.ibo = None
         self.style = style
         self.size = size
         self.contrast = contrast
         self.optimumIsMinimum = optimumIsMinimum
-        if grid is not None:
-            grid = self.normaliseGrid(grid)
-            vertices = styleDict[self.style][1](grid, self.size)
-            colours = self.genColourVector(
-                vertices, self.contrast, self.optimumIsMinimum)
+        # what the vertices of the last setHeights() were built with: z normalisation range, (size, style, contrast)
+        self.zRange = None
+        self.meshLayout = None
         self.set(
             grid,
             vertices,
@@ -42,7 +48,8 @@ class OglObject:
             colours,
             style,
             size,
-            contrast)
+            contrast,
+            indices)
         if vertices is None and grid is None:
             raise "Either grid or vertices must contain information"
         self.__alloc()
@@ -57,7 +64,8 @@ class OglObject:
             colours=None,
             style=None,
             size=None,
-            contrast=None):
+            contrast=None,
+            indices=None):
         contrastChanged = 0
         if contrast is not None and self.contrast != contrast:
             self.contrast = contrast
@@ -69,14 +77,19 @@ class OglObject:
         if (vertices is None or len(vertices) == 0) and grid is None:
             return ()
         if grid is not None:
-            grid = self.normaliseGrid(grid)
-            vertices = styleDict[self.style][1](grid, self.size)
-            colours = self.genColourVector(
-                vertices, self.contrast, self.optimumIsMinimum)
+            grid = np.array(grid, dtype=np.float64).reshape(-1, 3)
+            grid[:, 2] = self.normaliseHeights(grid[:, 2], grid[:, 2].min(), grid[:, 2].max())
+            indices, centres = grid_mesh(self.size, styleDict[self.style][1])
+            vertices = grid_mesh_vertices(grid, centres)
+            colours = self.genColours(vertices[:, 2], self.contrast, self.optimumIsMinimum).ravel()
+            vertices = vertices.astype(np.float32).ravel()
             contrastChanged = 0
         if contrastChanged:
-            colours = self.genColourVector(
-                vertices, self.contrast, self.optimumIsMinimum)
+            colours = self.genColours(np.asarray(vertices).reshape(-1, 3)[:, 2], self.contrast,
+                                      self.optimumIsMinimum).ravel()
+        if indices is not None and indices is not self.indices:
+            self.indices = indices
+            self.indicesChanged = True
 
         data = [
             0,
@@ -94,19 +107,75 @@ class OglObject:
                                  AS.valNbr: valNbr[t]})
         self.length = len(self.data[A.vert][AS.arr]) // 3
 
+    def setHeights(self, heights, coords, changed=None):
+        """grid objects: new heights for the size * size grid, whose [x, y] are the rows of coords. Only the vertices
+        (and colours) of the changed cells (a boolean mask), and the quad centres next to them, are redone and
+        uploaded; everything is rebuilt when changed is None, or when the z normalisation range, the contrast, the
+        size or the style moved"""
+        zRange = (float(heights.min()), float(heights.max()))
+        layout = (self.size, self.style, self.contrast)
+        indices, centres = grid_mesh(self.size, styleDict[self.style][1])
+        if changed is None or zRange != self.zRange or layout != self.meshLayout \
+                or not isinstance(self.data[A.vert][AS.arr], np.ndarray):
+            self.zRange = zRange
+            self.meshLayout = layout
+            vertices = grid_mesh_vertices(np.column_stack([coords, self.normaliseHeights(heights, *zRange)]), centres)
+            self.set(vertices=vertices.astype(np.float32).ravel(),
+                     colours=self.genColours(vertices[:, 2], self.contrast, self.optimumIsMinimum).ravel(),
+                     indices=indices)
+            return
+        cells = np.flatnonzero(changed)
+        if len(cells) == 0:
+            return
+        self.setVertexHeights(cells, self.normaliseHeights(heights[cells], *zRange))
+        if centres is not None:
+            quads = grid_cell_quads(self.size, cells)
+            z = self.normaliseHeights(heights[centres[quads]], *zRange).mean(axis=1)
+            self.setVertexHeights(self.size * self.size + quads, z)
+
+    def setVertexHeights(self, redo, z):
+        """sets the normalised z of the (sorted) vertices redo, and their colours"""
+        self.data[A.vert][AS.arr].reshape(-1, 3)[redo, 2] = z
+        self.data[A.col][AS.arr].reshape(-1, 3)[redo] = self.genColours(z, self.contrast, self.optimumIsMinimum)
+        spans = self.vertexSpans(redo)
+        for t in (A.vert, A.col):
+            self.markChanged(t, spans)
+
+    def vertexSpans(self, redo):
+        """[(first, end)] vertex ranges covering the sorted vertices redo; runs less than spanGap vertices apart
+        share a range, one glBufferSubData for a few unchanged vertices is cheaper than a call per run"""
+        cut = np.flatnonzero(np.diff(redo) > self.spanGap) + 1
+        firsts = redo[np.concatenate([[0], cut])]
+        ends = redo[np.concatenate([cut - 1, [len(redo) - 1]])] + 1
+        return list(zip(firsts.tolist(), ends.tolist()))
+
+    def markChanged(self, t, spans):
+        """only the vertex ranges spans of array t need uploading, on top of what already does"""
+        d = self.data[t]
+        if d[AS.changed] is True:
+            return
+        d[AS.changed] = (d[AS.changed] or []) + spans
+
+    @staticmethod
+    def hasData(arr):
+        return arr is not None and len(arr) > 0
+
+    @staticmethod
+    def bufferData(arr):
+        return np.ascontiguousarray(arr, dtype=np.float32)
+
     def __alloc(self):
         for t in A:
             d = self.data[t]
             if t == A.texSrc:
                 continue
-            elif d[AS.arr]:
+            elif self.hasData(d[AS.arr]):
                 d[AS.changed] = False
                 d[AS.vbo] = glGenBuffers(1)
                 glBindBuffer(GL_ARRAY_BUFFER, d[AS.vbo])
-                glBufferData(GL_ARRAY_BUFFER,
-                             len(d[AS.arr]) * 4,
-                             (c_float * len(d[AS.arr]))(*d[AS.arr]),
-                             GL_DYNAMIC_DRAW)
+                buf = self.bufferData(d[AS.arr])
+                glBufferData(GL_ARRAY_BUFFER, buf.nbytes, buf, GL_DYNAMIC_DRAW)
+        self.__updateIndices()
         err = glGetError()
         if err != 0:
             print('Error during buffer allocation', err)
@@ -119,11 +188,25 @@ class OglObject:
             d = self.data[t]
             if t == A.texSrc:
                 continue
-            elif d[AS.changed] and d[AS.arr]:
+            elif d[AS.changed] and self.hasData(d[AS.arr]):
+                # everything, or only the vertex ranges setHeights() touched
+                spans = [(0, len(d[AS.arr]) // d[AS.valNbr])] if d[AS.changed] is True else d[AS.changed]
                 d[AS.changed] = False
                 glBindBuffer(GL_ARRAY_BUFFER, d[AS.vbo])
-                glBufferSubData(GL_ARRAY_BUFFER, 0, len(
-                    d[AS.arr]) * 4, (c_float * len(d[AS.arr]))(*d[AS.arr]))
+                for first, end in spans:
+                    buf = self.bufferData(d[AS.arr][first * d[AS.valNbr]:end * d[AS.valNbr]])
+                    glBufferSubData(GL_ARRAY_BUFFER, first * d[AS.valNbr] * buf.itemsize, buf.nbytes, buf)
+        self.__updateIndices()
+
+    def __updateIndices(self):
+        if not self.indicesChanged:
+            return
+        self.indicesChanged = False
+        if self.ibo is None:
+            self.ibo = glGenBuffers(1)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ibo)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, self.indices.nbytes, self.indices, GL_STATIC_DRAW)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
 
     def draw(self):
         self.__update()
@@ -136,7 +219,12 @@ class OglObject:
             glEnableClientState(d[AS.const])
             glBindBuffer(GL_ARRAY_BUFFER, d[AS.vbo])
             d[AS.func](d[AS.valNbr], GL_FLOAT, 0, None)
-        glDrawArrays(styleDict[self.style][0], 0, self.length)
+        if self.indices is None:
+            glDrawArrays(styleDict[self.style][0], 0, self.length)
+        else:
+            glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ibo)
+            glDrawElements(styleDict[self.style][0], len(self.indices), GL_UNSIGNED_INT, None)
+            glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
         glBindBuffer(GL_ARRAY_BUFFER, 0)
         for t in A:
             d = self.data[t]
@@ -145,30 +233,15 @@ class OglObject:
             glDisableClientState(d[AS.const])
 
     @staticmethod
-    def normaliseGrid(grid):
-        valZMin, valZMax = math.inf, -math.inf
-        ii = 2
-        while ii < len(grid):
-            if valZMin > grid[ii]:
-                valZMin = grid[ii]
-            if valZMax < grid[ii]:
-                valZMax = grid[ii]
-            ii += 3
-        dist = valZMax - valZMin
-        div = dist / 2
-        ii = 2
-        while ii < len(grid):
-            try:
-                grid[ii] = (grid[ii] - valZMin) / div - 1
-            except ZeroDivisionError:
-                grid[ii] = 0
-            ii += 3
-        return (grid)
+    def normaliseHeights(z, zMin, zMax):
+        """z scaled from [zMin, zMax] to [-1, 1], all 0 if the range is empty"""
+        if zMax == zMin:
+            return np.zeros_like(z, dtype=np.float64)
+        return (z - zMin) / ((zMax - zMin) / 2) - 1
 
     @staticmethod
-    def genColourVector(vertices, contrast=0, optimumIsMinimum=True):
-        ii = 2
-        c = []
+    def genColours(z, contrast=0, optimumIsMinimum=True):
+        """(n, 3) float32 colours of the normalised heights z: a hue from red to blue, repeated with contrast > 1"""
         if contrast == 0:
             ex = 1
         else:
@@ -176,32 +249,17 @@ class OglObject:
                 ex = 0.3
             else:
                 ex = 2
+        pos = (np.asarray(z, dtype=np.float64) + 1.0) / 2
         if contrast > 1:
-            mul = 2 * (contrast - 1)
-        while ii < len(vertices):
-            pos = (vertices[ii] + 1.0) / 2
-            if contrast > 1:
-                pos = pos * mul
-                pos -= int(pos)
-            pos = pos ** ex
-            h = pos
-            i = int(h * 6.)  # XXX assume int() truncates!
-            f = (h * 6.) - i
-            p, q, t = 0, 1. - f, f
-            i %= 6
-            if i == 0:
-                col = (1, t, p)
-            if i == 1:
-                col = (q, 1, p)
-            if i == 2:
-                col = (p, 1, t)
-            if i == 3:
-                col = (p, q, 1)
-            if i == 4:
-                col = (t, p, 1)
-            if i == 5:
-                col = (1, p, q)
-            c.extend(col)
-            # c.extend(opacity) #opacity
-            ii += 3
-        return c
+            pos = pos * (2 * (contrast - 1))
+            pos -= np.trunc(pos)
+        h = pos ** ex
+        i = np.trunc(h * 6.)
+        f = h * 6. - i
+        i = i.astype(np.int64) % 6
+        p, q, t = 0, 1. - f, f
+        col = np.empty((len(h), 3), dtype=np.float32)
+        col[:, 0] = np.choose(i, [1, q, p, p, t, 1])
+        col[:, 1] = np.choose(i, [t, 1, 1, q, p, p])
+        col[:, 2] = np.choose(i, [p, p, t, 1, 1, q])
+        return col
@@ -5,6 +5,7 @@ from contextlib import suppress
 from OpenGL.GL import *
 from OpenGL.GLUT import *
 
+import numpy as np
 import pygame
 from pygame import DOUBLEBUF, OPENGL
 
@@ -12,6 +13,7 @@ from src.algorithms.algorithm import Algorithm
 from src.opengl.object import OglObject
 from src.types import DrawStyle, AS, A
 from src.utils import gen_cube, flatten_vertex_list, gen_basic_grid
+from src.worker import AlgorithmWorker
 
 
 class OglSolver:
@@ -26,7 +28,9 @@ class OglSolver:
             style=DrawStyle.triangles2,
             algorithms=None,
             run_algs_together=False,
-            redraw_mesh_on_restart=False):
+            redraw_mesh_on_restart=False,
+            print_phases=False,
+            target_frame_time=None):
 
         if algorithms is None:
             algorithms = [
@@ -45,8 +49,20 @@ class OglSolver:
             self.activeAlgorithm = 0
             print(self.algorithms[0])
         self.redrawMeshOnRestart = redraw_mesh_on_restart
-        self.solList = []
-        self.solOldList = []
+        self.printPhases = print_phases
+        for alg in self.algorithms:
+            alg.setProfiling(print_phases)
+        # the algorithms run on a background thread, every frame draws whatever it evaluated meanwhile
+        self.worker = AlgorithmWorker(self.algorithms, self.activeAlgorithm)
+        self.finishedReported = False
+        # target_frame_time (seconds): every frame takes at most frameBudget points from the worker, resized after
+        # every frame so that the frame (drawing the points included) takes about that long; the worker is held
+        # back to what the frames can take. None: every frame takes everything the worker has
+        self.targetFrameTime = target_frame_time
+        self.frameBudget = 4096 if target_frame_time else None
+        self.frameDrained = 0
+        if self.frameBudget:
+            self.worker.set_max_points(2 * self.frameBudget)
         self.rotation = [-60, 0, 20]
         self.scale = 1.0 / 1.1 ** 6
         self.pointSizeDivisor = 256
@@ -68,6 +84,7 @@ class OglSolver:
         # first list is averages, second is count (how many values yielded that
         # average)
         self.gridSource = self.init_grid_source()
+        self.meshSource = None  # the grid source the active object's mesh was last built from
         g = gen_basic_grid(self.size, self.size)
         self.objects.append(OglObject(
             grid=g,
@@ -77,21 +94,18 @@ class OglSolver:
             optimumIsMinimum=self.algorithms[0].optimumIsMinimum,
         ))
         self.activeObject = len(self.objects) - 1
-        gpv = self.objects[self.activeObject].data[A.vert][AS.arr][:]
+        gpv = np.array(self.objects[self.activeObject].data[A.vert][AS.arr], dtype=np.float32)
         gpStyle = self.objects[self.activeObject].style
         gpSize = self.objects[self.activeObject].size
-        gpl = len(gpv)
         self.zDrop = -1.3
-        ii = 2
-        while ii < gpl:
-            gpv[ii] = 0
-            ii += 3
+        gpv[2::3] = 0
         gp = OglObject(
             vertices=gpv,
             style=gpStyle,
             size=gpSize,
             contrast=self.contrast,
             optimumIsMinimum=self.algorithms[0].optimumIsMinimum,
+            indices=self.objects[self.activeObject].indices,
         )
         gp.data[A.col][AS.arr] = []
         # HACK! we use the same VRAM colour buffer, since the colour
@@ -103,7 +117,6 @@ class OglSolver:
         self.oldPoints = []
         self.newPoints = []
         self.paused = 0
-        self.doOneStep = 0
         self.doPrint = 1
         self.shouldDrawBottom = 1
         self.shouldDrawNewVertices = 1
@@ -145,24 +158,28 @@ class OglSolver:
         self.set_projection()
 
     def exit_program(self):
+        self.worker.stop()
         pygame.quit()
         raise SystemExit
 
     def init_grid_source(self, old_grid=None, redraw_mesh=True, start_value=0):
-        gs = [[], [0.0] * self.size * self.size, []]
+        """[mean, count, coords, sum]: flat size * size arrays, cell ii * size + jj; coords holds the [x, y] of every
+        cell. A cell's mean is sum / count once it was hit, before that start_value (or with redraw_mesh off, the old
+        grid's mean)"""
+        n = self.size * self.size
         if old_grid is None:
-            for ii in range(self.size):
-                xi = -1 + 2 * ii / (self.size - 1)
-                for jj in range(self.size):
-                    yi = -1 + 2 * jj / (self.size - 1)
-                    gs[2].append([xi, yi])
+            coords = self.grid_coords()
         else:
-            gs[2] = old_grid[2]
-            if not redraw_mesh:
-                gs[0] = old_grid[0]
-        if len(gs[0]) == 0:
-            gs[0] = [start_value] * self.size * self.size
-        return gs
+            coords = old_grid[2]
+        if old_grid is not None and not redraw_mesh:
+            mean = old_grid[0]
+        else:
+            mean = np.full(n, start_value, dtype=np.float64)
+        return [mean, np.zeros(n, dtype=np.int64), coords, np.zeros(n, dtype=np.float64)]
+
+    def grid_coords(self):
+        axis = np.linspace(-1, 1, self.size)
+        return np.column_stack([np.repeat(axis, self.size), np.tile(axis, self.size)])
 
     def display(self):
         # clears the image
@@ -185,10 +202,16 @@ class OglSolver:
             self.scale = 1 / 1.1 ** 6
         elif key == 32:
             self.paused = 1 - self.paused
+            self.worker.set_paused(self.paused)
         elif key == ord('n'):
-            self.doOneStep = 1
+            self.worker.step()
         elif key == ord('p'):
             self.doPrint = 1 - self.doPrint
+        elif key == ord('i'):
+            self.printPhases = not self.printPhases
+            with self.worker.lock:
+                for alg in self.algorithms:
+                    alg.setProfiling(self.printPhases)
         elif key == ord('b'):
             self.shouldDrawBottom = 1 - self.shouldDrawBottom
         elif key == ord('v'):
@@ -215,22 +238,24 @@ class OglSolver:
             a = self.activeAlgorithm
             steps = self.algorithms[a].steps
             steps = max(1, steps // 2)
-            if a == -1:
-                for alg in self.algorithms:
-                    alg.steps = steps
-            else:
-                self.algorithms[a].steps = steps
-            print('Algorithm steps per frame:', steps)
+            with self.worker.lock:
+                if a == -1:
+                    for alg in self.algorithms:
+                        alg.steps = steps
+                else:
+                    self.algorithms[a].steps = steps
+            print('Algorithm steps per worker run:', steps)
         elif key == 268:
             a = self.activeAlgorithm
             steps = self.algorithms[a].steps
             steps *= 2
-            if a == -1:
-                for alg in self.algorithms:
-                    alg.steps = steps
-            else:
-                self.algorithms[a].steps = steps
-            print('Algorithm steps per frame:', steps)
+            with self.worker.lock:
+                if a == -1:
+                    for alg in self.algorithms:
+                        alg.steps = steps
+                else:
+                    self.algorithms[a].steps = steps
+            print('Algorithm steps per worker run:', steps)
         elif key == ord('c'):
             self.contrast = (self.contrast + 1) % 5
             self.objects[self.activeObject].set(contrast=self.contrast)
@@ -241,6 +266,7 @@ class OglSolver:
                   self.algorithms[self.activeAlgorithm].doForever)
             # TODO eliminate workaround
             self.algorithms[self.activeAlgorithm].cr = 0
+            self.set_active_algorithm(self.activeAlgorithm)
             if self.redrawMeshOnRestart:
                 self.gridSource = self.init_grid_source(self.gridSource, self.redrawMeshOnRestart,
                                                         self.algorithms[self.activeAlgorithm].gimmeSomeEval())
@@ -253,14 +279,18 @@ class OglSolver:
                   self.algorithms[self.activeAlgorithm].doForever)
             # TODO eliminate workaround
             self.algorithms[self.activeAlgorithm].cr = 0
+            self.set_active_algorithm(self.activeAlgorithm)
             if self.redrawMeshOnRestart:
                 self.gridSource = self.init_grid_source(self.gridSource, self.redrawMeshOnRestart,
                                                         self.algorithms[self.activeAlgorithm].gimmeSomeEval())
                 # self.gridSource[0] = [0] * self.size ** 2
                 # self.gridSource[1] = [0] * self.size ** 2
         elif key == 47:
-            self.algorithms[self.activeAlgorithm].doForever = 1 - \
-                                                              self.algorithms[self.activeAlgorithm].doForever
+            with self.worker.lock:
+                self.algorithms[self.activeAlgorithm].doForever = 1 - \
+                                                                  self.algorithms[self.activeAlgorithm].doForever
+            self.worker.resume()
+            self.finishedReported = False
             print('Repeat (only) for the current algorithm set to:',
                   self.algorithms[self.activeAlgorithm].doForever)
         if 303 in self.pressedKeys or 304 in self.pressedKeys:
@@ -297,62 +327,51 @@ class OglSolver:
         glViewport(0, 0, GLsizei(self.w), GLsizei(self.h))
         pygame.display.set_mode((self.w, self.h), self.displayFlags)
 
-    def update_grid(self, sol_list):
-        for sol in sol_list:
-            l = (len(sol) - 1) // 2
-            z, x, y = sol[0], sol[1], sol[2]
-            xi, yi = sol[l + 1], sol[l + 2]
-            idx = xi * self.size + yi
-            num = self.gridSource[1][idx]
-            self.gridSource[0][idx] = (
-                                              self.gridSource[0][idx] * num + z) / (1 + num)
-            self.gridSource[1][idx] = 1 + num
-
-    def gen_mesh_from_grid(self, grid, coords=None):
-        g = []
-        if coords is None:
-            for ii in range(self.size):
-                for jj in range(self.size):
-                    x = -1 + 2.0 * ii / (self.size - 1)
-                    y = -1 + 2.0 * jj / (self.size - 1)
-                    z = grid[ii * self.size + jj]
-                    g.extend([x, y, z])
-        else:
-            for gp, ge in zip(coords, grid):
-                g.extend([*gp, ge])
-        return (g)
+    def update_grid(self, sol_list, sol_idx):
+        """accumulates the evaluations of a batch into their cells with a scatter-add; points outside the grid are
+        dropped. Returns the mask of the cells which changed"""
+        xi, yi = sol_idx[:, 0], sol_idx[:, 1]
+        inside = (xi >= 0) & (xi < self.size) & (yi >= 0) & (yi < self.size)
+        cells = xi[inside] * self.size + yi[inside]
+        mean, count, _, total = self.gridSource
+        hits = np.bincount(cells, minlength=len(count))
+        count += hits
+        total += np.bincount(cells, weights=sol_list[inside, 0], minlength=len(total))
+        changed = hits > 0
+        mean[changed] = total[changed] / count[changed]
+        return changed
 
     def normalise_sol_inputs(self, sol_list, dim_range):
+        """sol_list: (n, 1 + dimensions) array of rows [y, *X], read only; the normalised X in [-1, 1] become
+        self.newPoints, returns the grid index of every coordinate"""
         dim_length = dim_range[1] - dim_range[0]
-        s = self.size - 1
-        # sol = y, *X
-        for sol in sol_list:
-            p = []
-            for ii in range(1, len(sol)):
-                pos = (sol[ii] - dim_range[0]) / dim_length
-                sol[ii] = -1 + 2 * pos
-                idx = round(pos * s)
-                sol.append(idx)
-                p.append(sol[ii])
-            self.newPoints.append(p)
+        pos = (sol_list[:, 1:] - dim_range[0]) / dim_length
+        self.newPoints = -1 + 2 * pos
+        return np.rint(pos * (self.size - 1)).astype(np.int64)
+
+    def set_active_algorithm(self, a):
+        self.activeAlgorithm = a
+        self.worker.set_active(a)
+        self.finishedReported = False
 
     def update_algo(self):
-        self.oldPoints = self.newPoints
-        self.newPoints = []
+        # everything the worker evaluated since the last frame; with a sparse recording mode (or a slow objective)
+        # that can be nothing, only the worker decides when an algorithm finished
+        sol_list, finished = self.worker.drain(self.frameBudget)
+        self.frameDrained = 0 if sol_list is None else len(sol_list)
         a = self.activeAlgorithm
-        sol_list = []
-        if a == -1:
-            for alg in self.algorithms:
-                sol_list.extend(alg.run())
-        else:
-            sol_list.extend(self.algorithms[a].run())
         alg = self.algorithms[a]
-        if len(sol_list):
-            dim_range = alg.dimRange
-            self.normalise_sol_inputs(sol_list, dim_range)
-            self.update_grid(sol_list)
-            g = self.gen_mesh_from_grid(self.gridSource[0], self.gridSource[2])
-            self.objects[self.activeObject].set(grid=g, size=self.size)
+        if sol_list is not None:
+            self.oldPoints = self.newPoints
+            # with a budget the points lie on the simplex [0, budget], which the dimRange box needn't contain
+            dim_range = alg.dimRange if alg.budget is None else [0, alg.budget]
+            sol_idx = self.normalise_sol_inputs(sol_list, dim_range)
+            changed = self.update_grid(sol_list, sol_idx)
+            if self.meshSource is not self.gridSource:
+                # a new grid source (restart, other algorithm): every cell may differ from the mesh
+                self.meshSource = self.gridSource
+                changed = None
+            self.objects[self.activeObject].setHeights(self.gridSource[0], self.gridSource[2], changed)
             if self.doPrint:
                 print(
                     alg,
@@ -368,12 +387,15 @@ class OglSolver:
                     alg.repCurr,
                     '/',
                     alg.repeats)
+                if self.printPhases:
+                    print('Phases:', alg.formatPhaseStats())
                 if alg.be in [math.inf, -math.inf]:
                     try:
                         print('Current best is:', alg.ce)
                     except BaseException:
                         pass
-        else:
+        elif finished and not self.finishedReported:
+            self.finishedReported = True
             print(
                 alg,
                 'finished. ',
@@ -389,13 +411,15 @@ class OglSolver:
                 alg.repeats)
             if a != -1:
                 self.oldPoints = []
+                self.newPoints = []
                 a = (a + 1) % len(self.algorithms)
-                self.algorithms[a].restart()
-                self.activeAlgorithm = a
-                self.gridSource = self.init_grid_source(
-                    self.gridSource,
-                    self.redrawMeshOnRestart,
-                    self.algorithms[a].gimmeSomeEval())
+                with self.worker.lock:
+                    self.algorithms[a].restart()
+                    self.gridSource = self.init_grid_source(
+                        self.gridSource,
+                        self.redrawMeshOnRestart,
+                        self.algorithms[a].gimmeSomeEval())
+                self.set_active_algorithm(a)
         return sol_list
 
     def draw_differences(self, z):
@@ -408,10 +432,20 @@ class OglSolver:
             glVertex3f(p[0], p[1], z)
         glEnd()
 
+    def adapt_frame_budget(self, frame_time):
+        """multiplicative resize of frameBudget towards targetFrameTime, at most x1.25 up and /2 down per frame; it
+        only grows while the frames actually used it all"""
+        if not self.targetFrameTime:
+            return
+        ratio = self.targetFrameTime / max(frame_time, 1e-6)
+        if ratio > 1 and self.frameDrained < self.frameBudget:
+            return
+        budget = int(self.frameBudget * min(1.25, max(0.5, ratio)))
+        self.frameBudget = max(64, budget)
+        self.worker.set_max_points(2 * self.frameBudget)
+
     def draw_scene(self):
-        if self.paused == 0 or self.doOneStep == 1:
-            self.update_algo()
-            self.doOneStep = 0
+        self.update_algo()
         self.draw_progress_bar()
         self.set_projection()
         self.apply_scene_transforms()
@@ -505,10 +539,13 @@ class OglSolver:
                     self.mouse_move(event.pos, event.rel, event.buttons)
                 elif event.type == pygame.VIDEORESIZE:
                     self.resize(event.size)
+            t = time.perf_counter()
             self.display()
             pygame.display.flip()
+            self.adapt_frame_budget(time.perf_counter() - t)
             pygame.time.wait(0)
 
     def run(self):
+        self.worker.start()
         # launch the event loop
         self.main()
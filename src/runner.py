@@ -0,0 +1,93 @@
+import json
+import time
+
+
+class HeadlessRunner:
+    """drives an Algorithm at full speed, without any rendering (never imports OpenGL or pygame)
+
+    runs until the algorithm finishes, or until max_evals evaluations / max_time seconds, whichever comes first.
+    The best-so-far is tracked across restarts, so doForever algorithms can be given a budget.
+    recording: the Algorithm.setRecording mode for the visited points, off by default since nothing shows them;
+    None keeps the algorithm's own setting"""
+
+    def __init__(self, algorithm, max_evals=None, max_time=None, recording='off'):
+        self.algorithm = algorithm
+        if recording is not None:
+            algorithm.setRecording(recording)
+        self.max_evals = max_evals
+        self.max_time = max_time
+        self.be = algorithm.optInit  # best eval, over all restarts
+        self.bv = []  # values
+        self.bstep = 0  # total evals when the best was found
+        self.br = 0  # restart which found the best
+        self.evals = 0  # total evals, over all restarts
+        self.restarts = 0
+        self.solve_steps = 0  # solveStep calls, i.e. generations for the population algorithms
+        self.time = 0
+        self.finished = False  # True if the algorithm completed, False if stopped by the budget
+        self.history = []  # every improvement, as yielded by improvements()
+
+    def out_of_budget(self):
+        if self.max_evals is not None and self.evals >= self.max_evals:
+            return True
+        return self.max_time is not None and self.time >= self.max_time
+
+    def improvements(self):
+        """generator, yields a dict every time the best-so-far improves"""
+        alg = self.algorithm
+        start = time.perf_counter() - self.time
+        done = 0  # evals of the finished restarts
+        last = alg.evals
+        restarts = alg.restarts
+        while not self.out_of_budget():
+            seen = alg.exploredPoints.total
+            alg.solveStep()
+            self.solve_steps += 1
+            if alg.restarts != restarts:
+                # restarts happen at the beginning of solveStep, so last is the final count of the previous run
+                done += last
+                self.restarts += alg.restarts - restarts
+                restarts = alg.restarts
+            self.evals = done + alg.evals
+            self.time = time.perf_counter() - start
+            if alg.evals == last and alg.exploredPoints.total == seen:
+                self.finished = True  # a step without any evaluation: the algorithm is done
+                break
+            last = alg.evals
+            alg.exploredPoints.clear()
+            if alg.bv is not None and len(alg.bv) and alg.cmp(alg.be, self.be):
+                self.be = alg.be
+                self.bv = list(alg.bv)
+                self.bstep = done + alg.bstep
+                self.br = self.restarts
+                improvement = {'be': self.be, 'bv': self.bv, 'bstep': self.bstep, 'restart': self.br,
+                               'time': self.time}
+                self.history.append(improvement)
+                yield improvement
+
+    def run(self):
+        for _ in self.improvements():
+            pass
+        return self.result()
+
+    def result(self):
+        return {
+            'algorithm': str(self.algorithm),
+            'be': self.be,
+            'bv': self.bv,
+            'bstep': self.bstep,
+            'br': self.br,
+            'evals': self.evals,
+            'restarts': self.restarts,
+            'solveSteps': self.solve_steps,
+            'time': self.time,
+            'evalsPerSecond': self.evals / self.time if self.time else 0,
+            'finished': self.finished,
+            'phases': self.algorithm.getPhaseStats(),
+            'convergence': self.algorithm.getConvergenceStats(),
+            'improvements': self.history,
+        }
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.result(), f, indent=2)
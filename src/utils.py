@@ -1,95 +1,63 @@
-def grid_to_triangles2(grid, width=101):
-    """transforms a grid, defined as a list containing 3 float coordinates per vertex, and a width, into a triangle
-    strip"""
-    # quad points: i, i + 1, i + width, i + width + 1, up a quad strip
-    s = []
-    g = grid
-    length = len(grid) // 3
-    w = width
-    h = length // width
-    for ii in range(w - 1):
-        # p = [ii * h + jj, (ii + 1) * h + jj, ii * h + jj + 1, (ii + 1) * h + jj + 1]
-        xs = ii * h
-        points: list[int] = [
-            xs * 3,
-            (xs + h) * 3,
-            (xs + h + 1) * 3,
-            (xs + 1) * 3]
-        for jj in range(h - 1):
-            tri1 = g[points[0]:points[0] + 3]
-            tri1.extend(g[points[1]:points[1] + 3])
-            tri1.extend(g[points[2]:points[2] + 3])
-            tri2 = g[points[0]:points[0] + 3]
-            tri2.extend(g[points[2]:points[2] + 3])
-            tri2.extend(g[points[3]:points[3] + 3])
-            s.extend(tri1)
-            s.extend(tri2)
-            points[0] += 3
-            points[1] += 3
-            points[2] += 3
-            points[3] += 3
-    return s
-
-
-def quad_to_four_triangles(p0, p1, p2, p3):
-    p5 = []
-    for ii in zip(p0, p1, p2, p3):
-        p5.append(sum(ii) / 4)
-    r = p5 + p0 + p1 + p5 + p1 + p2 + p5 + p2 + p3 + p5 + p3 + p0
-    return r
-
-
-def grid_to_triangles4(grid, width=101):
-    """transforms a grid, defined as a list containing 3 float coordinates per vertex, and a width, into a triangle
-    strip"""
-    # quad points: i, i + 1, i + width, i + width + 1, up a quad strip
-    s = []
-    g = grid
-    length = len(grid) // 3
-    w = width
-    h = length // width
-    for ii in range(w - 1):
-        # p = [ii * h + jj, (ii + 1) * h + jj, ii * h + jj + 1, (ii + 1) * h + jj + 1]
-        xs = ii * h
-        points = [xs * 3, (xs + h) * 3, (xs + h + 1) * 3, (xs + 1) * 3]
-        for jj in range(h - 1):
-            s.extend(quad_to_four_triangles(g[points[0]:points[0] + 3],
-                                            g[points[1]:points[1] + 3],
-                                            g[points[2]:points[2] + 3],
-                                            g[points[3]:points[3] + 3],
-                                            ))
-            points[0] += 3
-            points[1] += 3
-            points[2] += 3
-            points[3] += 3
-    return s
-
-
-def grid_to_quads(grid, width=101):
-    """transforms a grid, defined as a list containing 3 float coordinates per vertex, and a width, into a triangle
-    strip"""
-    # quad points: i, i + 1, i + width, i + width + 1, up a quad strip
-    s = []
-    g = grid
-    length = len(grid) // 3
-    w = width
-    h = length // width
-    xs = 0
-    for ii in range(w - 1):
-        # p = [ii * h + jj, (ii + 1) * h + jj, ii * h + jj + 1, (ii + 1) * h + jj + 1]
-        points = [xs * 3, (xs + h) * 3, (xs + h + 1) * 3, (xs + 1) * 3]
-        for jj in range(h - 1):
-            s.extend(g[points[0]:points[0] + 3]
-                     + g[points[1]:points[1] + 3]
-                     + g[points[2]:points[2] + 3]
-                     + g[points[3]:points[3] + 3]
-                     )
-            points[0] += 3
-            points[1] += 3
-            points[2] += 3
-            points[3] += 3
-        xs += h
-    return s
+import numpy as np
+
+
+def grid_quad_corners(width):
+    """grid vertex indexes of the corners of every quad of a width x width grid, quad ii * (width - 1) + jj: the
+    vertex ii * width + jj, the one after it along x, the diagonal one and the one after it along y"""
+    ii = np.repeat(np.arange(width - 1), width - 1)
+    jj = np.tile(np.arange(width - 1), width - 1)
+    p0 = ii * width + jj
+    return p0, p0 + width, p0 + width + 1, p0 + 1
+
+
+def mesh_triangles2(width):
+    """(indices, centres) of a width x width grid as 2 triangles per quad; no extra vertices"""
+    p0, p1, p2, p3 = grid_quad_corners(width)
+    return np.stack([p0, p1, p2, p0, p2, p3], axis=1).ravel(), None
+
+
+def mesh_triangles4(width):
+    """(indices, centres) of a width x width grid as 4 triangles per quad, around a vertex in the middle of the quad;
+    the middle vertices follow the grid ones, one per quad, centres holds the 4 corners each is the mean of"""
+    p0, p1, p2, p3 = grid_quad_corners(width)
+    p5 = width * width + np.arange(len(p0))
+    return np.stack([p5, p0, p1, p5, p1, p2, p5, p2, p3, p5, p3, p0], axis=1).ravel(), np.stack([p0, p1, p2, p3], axis=1)
+
+
+def mesh_quads(width):
+    """(indices, centres) of a width x width grid as quads; no extra vertices"""
+    return np.stack(grid_quad_corners(width), axis=1).ravel(), None
+
+
+_meshes = {}
+
+
+def grid_mesh(width, builder):
+    """(indices, centres) of the indexed mesh builder (one of the mesh_* functions, see styleDict) makes of a
+    width x width grid, built once. The vertices are the grid's, vertex ii * width + jj, followed by a vertex for
+    every row of centres (if not None) at the mean of the grid vertices in it; indices is the uint32 element array.
+    Only the heights of the vertices change between frames, the topology is static"""
+    key = (width, builder)
+    if key not in _meshes:
+        indices, centres = builder(width)
+        _meshes[key] = (indices.astype(np.uint32), centres)
+    return _meshes[key]
+
+
+def grid_mesh_vertices(grid, centres):
+    """(n, 3) vertices of the mesh of grid, a (width * width, 3) array of [x, y, z]"""
+    if centres is None:
+        return grid
+    return np.concatenate([grid, grid[centres].mean(axis=1)])
+
+
+def grid_cell_quads(width, cells):
+    """the sorted indexes of the quads of a width x width grid which have one of the grid vertices cells as corner"""
+    ii, jj = np.divmod(cells, width)
+    qi = (ii[:, None] + np.array([-1, -1, 0, 0])).ravel()
+    qj = (jj[:, None] + np.array([-1, 0, -1, 0])).ravel()
+    inside = (qi >= 0) & (qi < width - 1) & (qj >= 0) & (qj < width - 1)
+    return np.unique(qi[inside] * (width - 1) + qj[inside])
 
 
 def gen_basic_grid(width, height):
@@ -0,0 +1,132 @@
+import threading
+from collections import deque
+
+import numpy as np
+
+
+class AlgorithmWorker:
+    """runs the active algorithm(s) continuously on a background thread and publishes the recorded points
+    (see Algorithm.setRecording) through a bounded buffer, which the renderer drains at its own frame rate
+
+    every iteration is one alg.run(), i.e. alg.steps solveSteps; active is an index into algorithms, or -1 to run all
+    of them. When a run evaluates nothing the algorithm has finished: the worker stops until set_active() (or
+    resume()) is called. The worker waits while more than max_points points are waiting to be drained, so the memory
+    stays bounded and no recorded point is lost.
+
+    Anything that changes the algorithms (restart, setProfiling, steps, ...) must be done holding lock."""
+
+    def __init__(self, algorithms, active=0, max_points=1 << 18):
+        self.algorithms = algorithms
+        self.active = active
+        self.max_points = max_points
+        self.lock = threading.RLock()  # the algorithms
+        self.cond = threading.Condition()  # the buffer and the flags below
+        self.chunks = deque()
+        self.queued = 0  # points in chunks
+        self.paused = False
+        self.single_steps = 0  # runs to do while paused
+        self.finished = False
+        self.stopped = False
+        self.runs = 0
+        self.generation = 0  # bumped by set_active, so a run of the previous algorithm(s) isn't published
+        self.thread = threading.Thread(target=self.loop, name='AlgorithmWorker', daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        with self.cond:
+            self.stopped = True
+            self.cond.notify_all()
+        if self.thread.is_alive() and threading.current_thread() is not self.thread:
+            self.thread.join()
+
+    def runnable(self):
+        if self.stopped:
+            return True
+        if self.finished or self.queued >= self.max_points:
+            return False
+        return not self.paused or self.single_steps > 0
+
+    def loop(self):
+        while True:
+            with self.cond:
+                self.cond.wait_for(self.runnable)
+                if self.stopped:
+                    return
+                if self.paused:
+                    self.single_steps -= 1
+                active = self.active
+                generation = self.generation
+            with self.lock:
+                ran = self.algorithms if active == -1 else [self.algorithms[active]]
+                # run() returns a view into the algorithm's buffer, it is only valid until its next run
+                points = [alg.run().copy() for alg in ran]
+                finished = not any(alg.exploredPoints.offered for alg in ran)
+                self.runs += 1
+            with self.cond:
+                if generation != self.generation:
+                    continue
+                for p in points:
+                    if len(p):
+                        self.chunks.append(p)
+                        self.queued += len(p)
+                self.finished = finished
+                self.cond.notify_all()
+
+    def drain(self, max_points=None):
+        """(the points published since the last drain, oldest first, as a single (n, 1 + dimensions) array or None,
+        finished); at most max_points of them, the rest stays for the next drain. finished is only reported once
+        everything was drained"""
+        chunks = []
+        n = 0
+        with self.cond:
+            while self.chunks and (max_points is None or n < max_points):
+                c = self.chunks.popleft()
+                if max_points is not None and n + len(c) > max_points:
+                    k = max_points - n
+                    self.chunks.appendleft(c[k:])
+                    c = c[:k]
+                chunks.append(c)
+                n += len(c)
+            self.queued -= n
+            finished = self.finished and not self.chunks
+            self.cond.notify_all()
+        if not chunks:
+            return None, finished
+        return (chunks[0] if len(chunks) == 1 else np.concatenate(chunks)), finished
+
+    def set_max_points(self, max_points):
+        with self.cond:
+            self.max_points = max_points
+            self.cond.notify_all()
+
+    def set_paused(self, paused):
+        with self.cond:
+            self.paused = paused
+            self.single_steps = 0
+            self.cond.notify_all()
+
+    def step(self):
+        """one more run while paused"""
+        with self.cond:
+            self.single_steps += 1
+            self.cond.notify_all()
+
+    def set_active(self, active):
+        """switches to another algorithm (or -1: all of them), dropping the points of the previous one; restart the
+        new one first, holding lock, if needed"""
+        with self.cond:
+            self.active = active
+            self.generation += 1
+            self.chunks.clear()
+            self.queued = 0
+            self.finished = False
+            self.cond.notify_all()
+
+    def resume(self):
+        """continues after finished, e.g. once doForever was switched on"""
+        with self.cond:
+            self.finished = False
+            self.cond.notify_all()